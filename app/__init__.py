@@ -1,13 +1,21 @@
-from fastapi import FastAPI
-from .database import init_db
-from .security import init_security
-from .exceptions import init_error_handling
-from .routes import init_routes
-from .middlewares import init_middlewares
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+def create_app() -> "FastAPI":
+    # Imported here so tools that only need `app.database` or `app.settings` (aerich, the uvicorn supervisor) skip the web stack
+    from fastapi import FastAPI
+    from .logs import init_logging
+    from .database import init_db
+    from .security import init_security
+    from .exceptions import init_error_handling
+    from .routes import init_routes
+    from .middlewares import init_middlewares
 
-def create_app() -> FastAPI:
     app = FastAPI(title="Backend", description="Backend for some App", version="0.0.1")
 
+    init_logging(app)
     init_db(app)
     init_error_handling(app)
     init_routes(app)
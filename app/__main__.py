@@ -2,12 +2,30 @@ import uvicorn
 from .settings import settings
 
 def main():
+    if settings.DEBUG:
+        uvicorn.run(
+            "app:create_app",
+            factory=True,
+            reload=True,
+            host=settings.API_HOST,
+            port=settings.API_PORT
+        )
+        return
+
+    # SIGTERM stops accepting connections and lets in-flight requests finish for up to API_GRACEFUL_SHUTDOWN seconds
     uvicorn.run(
         "app:create_app",
         factory=True,
-        reload=settings.DEBUG,
         host=settings.API_HOST,
-        port=settings.API_PORT
+        port=settings.API_PORT,
+        workers=settings.workers,
+        loop="auto",
+        http="auto",
+        backlog=settings.API_BACKLOG,
+        timeout_keep_alive=settings.API_KEEP_ALIVE,
+        timeout_graceful_shutdown=settings.API_GRACEFUL_SHUTDOWN,
+        # The app writes its own sampled access log off the event loop
+        access_log=False,
     )
 
 if __name__ == '__main__':
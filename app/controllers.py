@@ -1,7 +1,16 @@
-from typing import Optional
+from functools import partial
+from typing import Any, Optional, AsyncIterator
 from app.database.user_repository import user_repository, User
-from app.security import authenticate_user
-from app.exceptions import Unauthorized
+from app.security import authenticate_user, hash_password_async, password_needs_update, password_rehashes
+from app.exceptions import Unauthorized, ResourceNotFound
+from app.schemas import CreateUserOutput
+from app.utils.schema_factory import schema_fields
+from app.utils.pagination import CountMode
+from app.utils.etag import make_etag
+
+USER_FIELDS = schema_fields(CreateUserOutput, User)
+# The row version is read along with the user so ETags describe exactly what was sent
+USER_VERSIONED_FIELDS = [*USER_FIELDS, user_repository.version_field]
 
 async def create_user(**kwargs) -> dict:
     new_user = await user_repository.create(**kwargs)
@@ -12,14 +21,12 @@ async def create_user(**kwargs) -> dict:
         "username": new_user.username,
     }
 
-async def read_user(id: int) -> dict:
-    user = await user_repository.get(id=id)
-    return {
-        "id": user.id,
-        "name": user.name,
-        "age": user.age,
-        "username": user.username,
-    }
+async def read_user(id: int, version: Optional[tuple[Any, Any]] = None) -> tuple[dict, str]:
+    user = await user_repository.get(id=id, fields=USER_VERSIONED_FIELDS, version=version)
+    return user, make_etag(user_repository.row_version(user))
+
+async def user_version(id: int) -> tuple[Any, Any]:
+    return await user_repository.version(id)
 
 async def update_user(id: str, **kwargs) -> dict:
     updated_user = await user_repository.update(id=id, **kwargs)
@@ -33,27 +40,41 @@ async def update_user(id: str, **kwargs) -> dict:
 async def delete_user(id: str) -> None:
     return await user_repository.delete(id=id)
 
-async def read_users(skip: int = 0, limit: int = 100, filter_dict: Optional[dict] = None) -> list[dict]:
-    users = await user_repository.get_all(skip=skip, limit=limit, filter=filter_dict)
-    return [
-        {
-            "id": user.id,
-            "name": user.name,
-            "age": user.age,
-            "username": user.username,
-        } for user in users
-    ]
+async def read_users(skip: int = 0, limit: int = 100, filter_dict: Optional[dict] = None, after: Optional[str] = None, sort: Optional[str] = None) -> tuple[list[dict], Optional[str], str]:
+    users = await user_repository.get_all(skip=skip, limit=limit, filter=filter_dict, after=after, fields=USER_VERSIONED_FIELDS, sort=sort)
+    etag = make_etag([user_repository.row_version(user) for user in users])
+    return users, user_repository.next_cursor(users, limit, sort), etag
+
+async def read_users_by_id(ids: list[int]) -> tuple[list[dict], str]:
+    users = await user_repository.get_many(ids, fields=USER_VERSIONED_FIELDS)
+    return users, make_etag([user_repository.row_version(user) for user in users])
+
+async def users_version(skip: int = 0, limit: int = 100, filter_dict: Optional[dict] = None, after: Optional[str] = None, sort: Optional[str] = None) -> list[tuple[Any, Any]]:
+    return await user_repository.list_versions(skip=skip, limit=limit, filter=filter_dict, after=after, sort=sort)
+
+async def count_users(filter_dict: Optional[dict] = None, mode: CountMode = "exact") -> int:
+    return await user_repository.count(filter_dict, mode)
+
+def stream_users(filter_dict: Optional[dict] = None) -> AsyncIterator[list[dict]]:
+    return user_repository.stream(fields=USER_FIELDS, filter=filter_dict)
+
+async def rehash_password(id: int, password: str, hashed_password: str) -> None:
+    try:
+        # Only replaces the hash that was verified, so a password changed in the meantime is kept
+        await user_repository.update(id=id, expected={"password": hashed_password}, password=await hash_password_async(password))
+    except ResourceNotFound:
+        pass
 
 async def authenticate(username: str, password: str) -> dict:
-    user = await User.get(username=username)
-    if not user:
+    try:
+        user = await user_repository.filter(username=username, fields=[*USER_FIELDS, "password"])
+    except ResourceNotFound:
         raise Unauthorized("Invalid username")
-    print(password)
-    authenticate_user(password, user.password)
+    hashed_password = user.pop("password")
+    await authenticate_user(password, hashed_password)
+
+    # Hashes from an older scheme or a lower cost are upgraded after the response, not during it
+    if password_needs_update(hashed_password):
+        password_rehashes.run_once(user["id"], partial(rehash_password, user["id"], password, hashed_password))
     
-    return {
-        "id": str(user.id),
-        "name": user.name,
-        "age": user.age,
-        "username": user.username,
-    }
+    return {**user, "id": str(user["id"])}
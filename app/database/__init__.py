@@ -1,20 +1,54 @@
-from tortoise.contrib.fastapi import register_tortoise
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+from tortoise import connections
 from app.settings import settings
+from app.utils.metrics import metrics
+from app.utils.replicas import REPLICA_ERRORS, ReplicaRouter
+from app.utils.query_stats import instrument_clients
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+# Every worker opens its own pool, so the per-worker size is capped to keep the total under DB_MAX_CONNECTIONS
+DB_POOL_MAX_SIZE = max(1, min(settings.DB_POOL_MAX_SIZE, settings.DB_MAX_CONNECTIONS // settings.workers))
+DB_POOL_MIN_SIZE = min(settings.DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE)
+
+DB_CREDENTIALS = {
+    "host": settings.DB_HOST,
+    "port": settings.DB_PORT,
+    "user": settings.DB_USERNAME,
+    "database": settings.DB_DATABASE,
+    "password": settings.DB_PASSWORD,
+    "minsize": DB_POOL_MIN_SIZE,
+    "maxsize": DB_POOL_MAX_SIZE,
+    "init_size": DB_POOL_MIN_SIZE,
+    "max_queries": settings.DB_POOL_MAX_QUERIES,
+    "max_inactive_connection_lifetime": settings.DB_POOL_MAX_IDLE_TIME,
+    "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+}
+
+def replica_connection(replica: str) -> str | dict:
+    # Full URLs are used as-is; anything else is the host[:port] of a primary clone
+    if "://" in replica:
+        return replica
+
+    host, _, port = replica.partition(":")
+    return {
+        'engine': 'app.database.pool',
+        'credentials': {**DB_CREDENTIALS, "host": host, "port": int(port) if port else settings.DB_PORT},
+    }
+
+REPLICA_CONNECTIONS = {f"replica_{i}": replica_connection(replica) for i, replica in enumerate(settings.DB_REPLICAS)}
 
 TORTOISE_ORM = {
         'connections': 
         {
             'default': 
             {
-                'engine': 'tortoise.backends.asyncpg',
-                'credentials': {
-                    "host": settings.DB_HOST,
-                    "port": settings.DB_PORT,
-                    "user": settings.DB_USERNAME,
-                    "database": settings.DB_DATABASE,
-                    "password": settings.DB_PASSWORD
-                }
+                'engine': 'app.database.pool',
+                'credentials': DB_CREDENTIALS,
             },
+            **REPLICA_CONNECTIONS,
         },
         "apps": {
             "models": {
@@ -24,10 +58,34 @@ TORTOISE_ORM = {
         },
     }
 
+replica_router = ReplicaRouter(list(REPLICA_CONNECTIONS), settings.DB_REPLICA_SELECTION, settings.DB_REPLICA_RETRY_AFTER)
+
+@asynccontextmanager
+async def warmup_lifespan(app: "FastAPI"):
+    # Runs after register_tortoise has loaded the backends, so their client classes exist
+    instrument_clients()
+
+    # The first query opens the pool with its minimum size, so no request pays for connection setup
+    for name in connections.db_config:
+        try:
+            await connections.get(name).execute_query("SELECT 1")
+        except REPLICA_ERRORS:
+            # A replica that is down at startup is skipped until its retry delay passes; the primary must be up
+            if name not in REPLICA_CONNECTIONS:
+                raise
+            replica_router.mark_failed(name)
+    yield
+
 def init_db(app):
+    # FastAPI is only needed when serving; aerich and other CLI tools import this module just for TORTOISE_ORM
+    from tortoise.contrib.fastapi import register_tortoise
+    from app.utils.lifespan import add_lifespan
+
     register_tortoise(
         app,
         config=TORTOISE_ORM,
         generate_schemas=settings.DEBUG,
         add_exception_handlers=settings.DEBUG,
-    )
\ No newline at end of file
+    )
+    add_lifespan(app, warmup_lifespan)
+    metrics.register_stats("db_replicas", replica_router.stats)
\ No newline at end of file
@@ -4,9 +4,11 @@ from tortoise import fields
 class User(Model):
     class Meta:
         table = 'user'
+        indexes = (("name", "id"), ("age", "id"))
 
     name = fields.TextField()
     birthdate = fields.DateField(null=True)
     age = fields.IntField(null=True)
     username = fields.CharField(unique=True, max_length=20)
     password = fields.CharField(max_length=128)
+    modified_at = fields.DatetimeField(auto_now=True)
@@ -0,0 +1,60 @@
+import time
+from typing import Any
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+from app.utils.metrics import metrics
+
+
+class InstrumentedPool:
+    def __init__(self, pool: Any) -> None:
+        self._pool = pool
+        self.waiters = 0
+        self.acquires = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+
+    async def acquire(self, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        self.waiters += 1
+        try:
+            connection = await self._pool.acquire(*args, **kwargs)
+        finally:
+            self.waiters -= 1
+
+        wait_time = time.perf_counter() - start
+        self.acquires += 1
+        self.acquire_wait_total += wait_time
+        self.acquire_wait_max = max(self.acquire_wait_max, wait_time)
+        return connection
+
+    def stats(self) -> dict:
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "size": size,
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "in_use": size - idle,
+            "idle": idle,
+            "waiters": self.waiters,
+            "acquires": self.acquires,
+            "acquire_wait_seconds_total": self.acquire_wait_total,
+            "acquire_wait_seconds_max": self.acquire_wait_max,
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
+class InstrumentedAsyncpgClient(AsyncpgDBClient):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        metrics.register_stats(f"db_pool_{self.connection_name}", self.pool_stats)
+
+    async def create_pool(self, **kwargs: Any) -> InstrumentedPool:
+        return InstrumentedPool(await super().create_pool(**kwargs))
+
+    def pool_stats(self) -> dict:
+        return self._pool.stats() if self._pool is not None else {}
+
+
+client_class = InstrumentedAsyncpgClient
@@ -1,9 +1,36 @@
 from app.utils.base_repo import BaseRepository
+from app.utils.cache import InMemoryCache
+from app.utils.filters import FilterSpec
+from app.utils.singleflight import SingleFlight
+from app.utils.loader import BatchLoader
+from app.utils.metrics import metrics
+from app.settings import settings
+from . import replica_router
 from .models import User
 
 class UserRepository(BaseRepository):
     model = User
     related_models = []
+    version_field = "modified_at"
+    cache = InMemoryCache(maxsize=settings.DB_CACHE_SIZE, ttl=settings.DB_CACHE_TTL)
+    count_cache = InMemoryCache(maxsize=settings.COUNT_CACHE_SIZE, ttl=settings.COUNT_CACHE_TTL)
+    flights = SingleFlight()
+    loader = BatchLoader(window=settings.DB_BATCH_WINDOW_MS / 1000, max_batch=settings.DB_BATCH_MAX_SIZE)
+    replicas = replica_router
+    filter_spec = FilterSpec(
+        fields={
+            "id": ("eq", "in", "range"),
+            "username": ("eq", "prefix", "in"),
+            "name": ("eq", "prefix"),
+            "age": ("eq", "range", "in"),
+        },
+        # age is nullable, so it can be filtered on but not used as a keyset sort key
+        sort_keys=("id", "username", "name"),
+    )
 
 
-user_repository = UserRepository()
\ No newline at end of file
+user_repository = UserRepository()
+metrics.register_stats("user_cache", UserRepository.cache.stats)
+metrics.register_stats("user_count_cache", UserRepository.count_cache.stats)
+metrics.register_stats("user_reads", UserRepository.flights.stats)
+metrics.register_stats("user_batches", UserRepository.loader.stats)
\ No newline at end of file
@@ -28,6 +28,11 @@ class BaseHTTPException(Exception):
     def __str__(self) -> str:
         return f"{self.status_code}: {self.message}"
 
+class BadRequest(BaseHTTPException):
+    def __init__(self, message: str = None) -> None:
+        self.status_code = status.HTTP_400_BAD_REQUEST
+        self.message = f'Bad request - {message}' if message else 'Bad request'
+
 class Unauthorized(BaseHTTPException):
     def __init__(self, message: str = None) -> None:
         self.status_code = status.HTTP_401_UNAUTHORIZED
@@ -38,11 +43,21 @@ class Forbidden(BaseHTTPException):
         self.status_code = status.HTTP_403_FORBIDDEN
         self.message = f'Forbidden - {message}' if message else 'Forbidden'
 
+class ServiceUnavailable(BaseHTTPException):
+    def __init__(self, message: str = None, retry_after: int = 1) -> None:
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self.message = f'Service unavailable - {message}' if message else 'Service unavailable'
+        self.retry_after = retry_after
+
 
-def parse_response(status_code: int, error: str) -> JSONResponse:
-    return JSONResponse(status_code=status_code, content={"error": error, "user_friendly": True } )
+def parse_response(status_code: int, error: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"error": error, "user_friendly": True }, headers=headers)
 
 def init_error_handling(app: FastAPI) -> None:
+    @app.exception_handler(BadRequest)
+    async def bad_request_exception_handler(request: Request, exc: BadRequest):
+        return parse_response(status.HTTP_400_BAD_REQUEST, str(exc))
+
     @app.exception_handler(Unauthorized)
     async def unauthorized_exception_handler(request: Request, exc: Unauthorized):
         return parse_response(status.HTTP_401_UNAUTHORIZED, str(exc))
@@ -51,6 +66,10 @@ def init_error_handling(app: FastAPI) -> None:
     async def forbidden_exception_handler(request: Request, exc: Forbidden):
         return parse_response(status.HTTP_403_FORBIDDEN, str(exc))
     
+    @app.exception_handler(ServiceUnavailable)
+    async def service_unavailable_exception_handler(request: Request, exc: ServiceUnavailable):
+        return parse_response(status.HTTP_503_SERVICE_UNAVAILABLE, str(exc), headers={"Retry-After": str(exc.retry_after)})
+
     @app.exception_handler(ResourceNotFound)
     async def resource_not_found_exception_handler(request: Request, exc: ResourceNotFound):
         return parse_response(status.HTTP_404_NOT_FOUND, str(exc)) 
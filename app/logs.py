@@ -0,0 +1,138 @@
+import sys
+import copy
+import queue
+import random
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import orjson
+from fastapi import FastAPI
+
+from app.utils.lifespan import add_lifespan
+from app.utils.metrics import metrics
+from app.settings import settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+access_logger = logging.getLogger("app.access")
+
+# Everything a LogRecord carries by itself; any other attribute came in through `extra`
+RECORD_ATTRIBUTES = {*vars(logging.makeLogRecord({})), "message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RequestIdFilter(logging.Filter):
+    # Runs in the caller's context, before the record is handed to the listener thread
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the parts that can't leave the caller are rendered here: the message arguments and the traceback
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # A full queue drops the record rather than blocking the event loop on a slow stdout
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Blocks on a full queue at shutdown, so the records queued before it are still written
+        self.queue.put(self._sentinel)
+
+
+class AccessLogSampler:
+    def __init__(self, rates: dict[str, float]) -> None:
+        # Rates are keyed by status class, e.g. {"2xx": 0.01}; classes without a rate are always logged
+        self.rates = rates
+        self.sampled = 0
+        self.skipped = 0
+
+    def sample(self, status_code: int) -> bool:
+        rate = self.rates.get(f"{status_code // 100}xx", 1.0)
+        if rate >= 1 or random.random() < rate:
+            self.sampled += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self) -> dict:
+        return {"sampled": self.sampled, "skipped": self.skipped}
+
+
+class LogPipeline:
+    def __init__(self, queue_size: int, level: str) -> None:
+        self.level = level
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(RequestIdFilter())
+
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self.listener = DrainingQueueListener(self.queue, output, respect_handler_level=True)
+
+    def install(self) -> None:
+        # Replaces whatever the root logger had, so every module's records go through the queue
+        logging.basicConfig(level=self.level, handlers=[self.handler], force=True)
+
+    def start(self) -> None:
+        self.listener.start()
+
+    def stop(self) -> None:
+        self.listener.stop()
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), "dropped": self.handler.dropped}
+
+
+log_pipeline = LogPipeline(settings.LOG_QUEUE_SIZE, settings.LOG_LEVEL)
+access_sampler = AccessLogSampler(settings.LOG_ACCESS_SAMPLE_RATES)
+
+@asynccontextmanager
+async def log_pipeline_lifespan(app: FastAPI):
+    log_pipeline.start()
+    yield
+    log_pipeline.stop()
+
+def init_logging(app: FastAPI) -> None:
+    # Registered first so the listener outlives every other lifespan and writes their shutdown logs
+    log_pipeline.install()
+    add_lifespan(app, log_pipeline_lifespan)
+    metrics.register_stats("log_queue", log_pipeline.stats)
+    metrics.register_stats("access_log", access_sampler.stats)
@@ -1,21 +1,223 @@
-import time
 import logging
-from fastapi import FastAPI, Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from uuid import uuid4
+from typing import Optional
+from time import perf_counter_ns
+from fastapi import FastAPI
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from app.utils.metrics import metrics, COUNT_BUCKETS
+from app.utils.replicas import read_from_primary
+from app.utils.query_stats import QueryStats, query_stats
+from app.utils.encoding import negotiate_encoding, create_encoder, compressible, timed
+from app.utils.etag import weaken_etag
+from app.settings import settings
+from app.logs import REQUEST_ID_HEADER, request_id, access_logger, access_sampler
 
-logging.basicConfig(level=logging.INFO)
+UNMATCHED_ROUTE = "<unmatched>"
+SERVER_TIMING_HEADER = b"server-timing"
 
-class ProcessTimeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        process_time = process_time * 1000
-        process_time = round(process_time, 2)
-        logging.info(f"\nRequest: {request.url.path} completed in {process_time} miliseconds")
-        return response
-    
+logger = logging.getLogger(__name__)
+
+request_latency = metrics.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+request_queries = metrics.histogram("http_request_db_queries", "Database queries per HTTP request", ("method", "route"), COUNT_BUCKETS)
+request_query_time = metrics.histogram("http_request_db_duration_seconds", "Database time per HTTP request", ("method", "route"))
+requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+
+
+def route_template(scope: Scope) -> str:
+    # Newer FastAPI keeps included routers un-flattened, so the prefixed template lives on the effective route context
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter_ns()
+        method = (scope["method"],)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        requests_in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec(method)
+            # Labelling by route template rather than raw path keeps the series count bounded
+            request_latency.observe_ns((scope["method"], route_template(scope), status_code), perf_counter_ns() - start)
+
+
+class ReadYourWritesMiddleware:
+    # Scopes the primary pin set by repository writes to the request that made them
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        token = read_from_primary.set(False)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            read_from_primary.reset(token)
+
+
+class AccessLogMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.header = REQUEST_ID_HEADER.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # A request id from an upstream proxy is kept, so one id follows the request across services
+        incoming = dict(scope["headers"]).get(self.header)
+        current_id = incoming.decode("latin-1") if incoming else uuid4().hex
+        token = request_id.set(current_id)
+        start = perf_counter_ns()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (self.header, current_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if access_sampler.sample(status_code):
+                # The record is only queued here; JSON encoding and the write happen on the listener thread
+                access_logger.info("request", extra={
+                    "method": scope["method"],
+                    "route": route_template(scope),
+                    "status": status_code,
+                    "latency_ms": (perf_counter_ns() - start) / 1e6,
+                })
+            request_id.reset(token)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, warn_threshold: int = 0) -> None:
+        self.app = app
+        self.warn_threshold = warn_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Streamed bodies keep querying after this point; the header only covers the queries before it
+                timing = f'db;dur={stats.duration_ms:.2f};desc="queries: {stats.count}"'.encode()
+                message["headers"] = [*message.get("headers", []), (SERVER_TIMING_HEADER, timing)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
+            labels = (scope["method"], route_template(scope))
+            request_queries.observe(labels, stats.count)
+            request_query_time.observe_ns(labels, stats.duration_ns)
+
+            if self.warn_threshold and stats.count > self.warn_threshold:
+                # Usually an N+1: a query per row instead of one for the whole list
+                logger.warning("Request ran %d queries", stats.count, extra={
+                    "method": labels[0],
+                    "route": labels[1],
+                    "queries": stats.count,
+                    "db_ms": stats.duration_ms,
+                })
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, encoder
+
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the response is worth compressing
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                # Streamed bodies are always compressed, since their size isn't known up front
+                if "content-encoding" not in headers and compressible(headers.get("content-type")) and (more_body or len(body) >= self.minimum_size):
+                    encoder = create_encoder(encoding, self.gzip_level, self.brotli_quality)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    # The compressed bytes differ from the identity ones, so the validator only stays weakly equal
+                    weaken_etag(headers)
+                elif start["status"] == 304:
+                    # A 304 has no body to compress, but it must carry the validator and Vary of the compressed 200 it
+                    # revalidates; a weak validator still weakly matches the strong one of a 200 too small to compress
+                    headers.add_vary_header("Accept-Encoding")
+                    weaken_etag(headers)
+
+                await send(start)
+                start = None
+
+            if encoder is None:
+                await send(message)
+                return
+
+            # Chunks are compressed as they come, so a streamed export is never buffered whole
+            compressed = timed(encoding, lambda: encoder.compress(body, final=not more_body), len(body))
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
 
 
 def init_middlewares(app: FastAPI) -> None:
-    app.add_middleware(ProcessTimeMiddleware)
\ No newline at end of file
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(QueryStatsMiddleware, warn_threshold=settings.DB_QUERY_WARN_THRESHOLD)
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(MetricsMiddleware)
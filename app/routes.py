@@ -1,12 +1,22 @@
-from fastapi import FastAPI, APIRouter, Depends, Response, status
-from app.security import set_token_cookie, revoke_token_cookie, get_current_user, hash_password, TokenData
-from app.controllers import read_users, read_user, create_user, update_user, delete_user, authenticate
+from functools import partial
+from fastapi import FastAPI, APIRouter, Depends, Request, Response, status
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from app.security import set_token_cookie, revoke_token_cookie, get_current_user, hash_password_async, TokenData
+from app.controllers import read_users, read_users_by_id, read_user, create_user, update_user, delete_user, authenticate, stream_users, count_users, user_version, users_version, USER_FIELDS
 from app.schemas import CreateUserInput, CreateUserOutput
+from app.utils.pagination import CountMode, set_next_cursor, set_total_count
+from app.utils.export import ExportFormat, export_response
+from app.utils.filters import filter_from_query, ids_from_query
+from app.utils.etag import not_modified, set_etag
+from app.utils.admission import AdmissionLimiter, admission
+from app.utils.metrics import metrics
+from app.utils.serialization import dump_rows, fast_response, msgpack_headers, msgpack_response
+from app.settings import settings
 
-def create_login_router() -> APIRouter:
+def create_login_router(limiter: AdmissionLimiter = None) -> APIRouter:
     router = APIRouter()
 
-    @router.post("/login", status_code=status.HTTP_200_OK)
+    @router.post("/login", status_code=status.HTTP_200_OK, dependencies=admission(limiter))
     async def login(username: str, password: str, response: Response) -> dict:
         user = await authenticate(username, password)
         token_data = TokenData(sub=user['id'])
@@ -21,37 +31,93 @@ def create_login_router() -> APIRouter:
 
     return router
 
-def create_rest_router() -> APIRouter:
+def create_rest_router(fast_responses: bool = settings.FAST_RESPONSES, limits: dict[str, AdmissionLimiter] = None) -> APIRouter:
     router = APIRouter()
+    limits = limits or {}
 
-    @router.post("/user", response_model=CreateUserOutput, status_code=status.HTTP_201_CREATED)
+    def respond(content: dict | list[dict], response: Response = None, status_code: int = status.HTTP_200_OK):
+        if not fast_responses:
+            return content
+        return fast_response(dump_rows(content, USER_FIELDS), response, status_code)
+
+    @router.post("/user", response_model=CreateUserOutput, status_code=status.HTTP_201_CREATED, dependencies=admission(limits.get("create")))
     async def create(input: CreateUserInput) -> dict:
-        new_user = await create_user(name=input.name, age=input.age, username=input.username, password=hash_password(input.password))
-        return new_user
+        new_user = await create_user(name=input.name, age=input.age, username=input.username, password=await hash_password_async(input.password))
+        return respond(new_user, status_code=status.HTTP_201_CREATED)
+
+    @router.get("/users", response_model=list[CreateUserOutput], status_code=status.HTTP_200_OK, dependencies=admission(limits.get("read_all")))
+    async def read_all(request: Request, response: Response, skip: int = 0, limit: int = 100, filter: str = None, filter_value: str = None, filter_op: str = "eq", sort: str = None, after: str = None, count: CountMode = None, ids: str = None) -> list[dict]:
+        # ?ids=1,2,3 fetches those users in one query, batched with concurrent single reads
+        id_list = ids_from_query(ids)
+        if id_list is not None:
+            users, etag = await read_users_by_id(id_list)
+            set_etag(response, etag)
+            return msgpack_response(request, users, USER_FIELDS, response) or respond(users, response)
+
+        filter_dict = filter_from_query(filter, filter_value, filter_op)
+        if not count:
+            unchanged, _ = await not_modified(request, partial(users_version, skip=skip, limit=limit, filter_dict=filter_dict, after=after, sort=sort))
+            if unchanged:
+                msgpack_headers(request, unchanged)
+                return unchanged
 
-    @router.get("/users", response_model=list[CreateUserOutput], status_code=status.HTTP_200_OK)
-    async def read_all(skip: int = 0, limit: int = 100, filter: str = None, filter_value: str = None) -> list[dict]:
-        filter_dict = {filter: filter_value} if filter else None
-        return await read_users(skip=skip, limit=limit, filter_dict=filter_dict)
+        users, cursor, etag = await read_users(skip=skip, limit=limit, filter_dict=filter_dict, after=after, sort=sort)
+        set_next_cursor(response, cursor)
+        set_etag(response, etag)
+        if count:
+            set_total_count(response, await count_users(filter_dict, count), count)
+        return msgpack_response(request, users, USER_FIELDS, response) or respond(users, response)
 
-    @router.get("/user", response_model=CreateUserOutput, status_code=status.HTTP_200_OK)
-    async def read(user_id: str = Depends(get_current_user)) -> dict:
-        return await read_user(id=user_id)
+    @router.get("/users/export", status_code=status.HTTP_200_OK, dependencies=admission(limits.get("export")))
+    async def export(format: ExportFormat = "ndjson", filter: str = None, filter_value: str = None, filter_op: str = "eq") -> StreamingResponse:
+        filter_dict = filter_from_query(filter, filter_value, filter_op)
+        return export_response(stream_users(filter_dict=filter_dict), USER_FIELDS, format, "users")
 
-    @router.put("/user", response_model=CreateUserOutput, status_code=status.HTTP_200_OK)
+    @router.get("/user", response_model=CreateUserOutput, status_code=status.HTTP_200_OK, dependencies=admission(limits.get("read")))
+    async def read(request: Request, response: Response, user_id: str = Depends(get_current_user)) -> dict:
+        unchanged, version = await not_modified(request, partial(user_version, user_id))
+        if unchanged:
+            return unchanged
+
+        user, etag = await read_user(id=user_id, version=version)
+        set_etag(response, etag)
+        return respond(user, response)
+
+    @router.put("/user", response_model=CreateUserOutput, status_code=status.HTTP_200_OK, dependencies=admission(limits.get("update")))
     async def update(input: CreateUserInput, user_id: str = Depends(get_current_user)) -> dict:
-        updated_user = await update_user(id=user_id, name=input.name, age=input.age, username=input.username, password=input.password)
-        return updated_user
+        updated_user = await update_user(id=user_id, name=input.name, age=input.age, username=input.username, password=await hash_password_async(input.password))
+        return respond(updated_user)
 
-    @router.delete("/user", status_code=status.HTTP_204_NO_CONTENT)
+    @router.delete("/user", status_code=status.HTTP_204_NO_CONTENT, dependencies=admission(limits.get("delete")))
     async def delete(user_id: str = Depends(get_current_user)) -> None:
         await delete_user(id=user_id)
 
     return router
 
+def create_metrics_router() -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def read_metrics() -> str:
+        return metrics.render()
+
+    return router
+
 
 def init_routes(app: FastAPI):
-    user_crud_router = create_rest_router()
-    login_router = create_login_router()
+    # Login, sign-up and password changes all queue on bcrypt, so they share one limit
+    password_limiter = AdmissionLimiter(
+        "password_routes",
+        limit=settings.PASSWORD_ROUTES_CONCURRENCY,
+        queue_size=settings.PASSWORD_ROUTES_QUEUE,
+        timeout=settings.PASSWORD_ROUTES_QUEUE_TIMEOUT,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+    )
+    metrics.register_stats("admission_password_routes", password_limiter.stats)
+
+    user_crud_router = create_rest_router(limits={"create": password_limiter, "update": password_limiter})
+    login_router = create_login_router(limiter=password_limiter)
+    metrics_router = create_metrics_router()
+    app.include_router(metrics_router)
     app.include_router(login_router, prefix="/api", tags=["login"])
     app.include_router(user_crud_router, prefix="/api", tags=["user"])
\ No newline at end of file
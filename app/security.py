@@ -1,16 +1,22 @@
 from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from passlib.context import CryptContext
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Annotated
-from jose import JWTError, jwt
 from pydantic import BaseModel
 from fastapi import Depends
 from fastapi.security import APIKeyCookie
 
 from app.exceptions import Unauthorized
+from app.utils.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_MODE_HEADER
+from app.utils.etag import ETAG_HEADER
+from app.logs import REQUEST_ID_HEADER
+from app.utils.executor import BoundedExecutor
+from app.utils.background import BackgroundTasks
+from app.utils.lifespan import add_lifespan
+from app.utils.cache import LRUCache
+from app.utils.metrics import metrics
 from app.settings import settings
 
 SECRET_KEY = settings.JWT_AUTH_SECRET
@@ -18,12 +24,17 @@ ALGORITHM = settings.JWT_ALGORITHM
 JWT_EXPIRE = settings.JWT_EXPIRES
 JWT_KEY_NAME = settings.JWT_KEY_NAME
 
+verified_tokens = LRUCache(maxsize=settings.JWT_CACHE_SIZE)
+
 jwt_cookie_scheme = APIKeyCookie(name=JWT_KEY_NAME, auto_error=True)
 
 class TokenData(BaseModel):
     sub: str
     
+# jose and passlib are imported on first use, which keeps them out of startup for processes that never need them
 def create_token(data: dict, expires_delta: timedelta | None = None):
+    from jose import jwt
+
     to_encode = data.copy()
 
     if expires_delta:
@@ -38,12 +49,21 @@ def create_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 def decode_token(token: str) -> TokenData:
+    token_data = verified_tokens.get(token)
+    if token_data is not None:
+        return token_data
+
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         token_data = TokenData(**payload)
 
     except JWTError as e:
         raise Unauthorized(f"Could not validate credentials: {e}")
+
+    # Entries expire together with the token, so a cached token is never accepted past its exp
+    verified_tokens.set(token, token_data, expires_at=payload.get("exp"))
     
     return token_data
 
@@ -58,7 +78,6 @@ def revoke_token_cookie(response: Response) -> None:
 
 
 def get_current_user(token: Annotated[str, Depends(jwt_cookie_scheme)]) -> str:
-    print(token)
     token_data = decode_token(token)
 
     user_id: str = token_data.sub
@@ -68,23 +87,53 @@ def get_current_user(token: Annotated[str, Depends(jwt_cookie_scheme)]) -> str:
 
     return user_id
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def password_context():
+    from app.utils.password_hashing import build_context
+    return build_context(settings.PASSWORD_SCHEMES, settings.PASSWORD_HASH_TARGET_MS, settings.PASSWORD_HASH_ROUNDS, settings.PASSWORD_ARGON2_MEMORY_COST)
+
+password_executor = BoundedExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, name="password-hash")
+password_rehashes = BackgroundTasks(name="password-rehash")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
-    return password_context.hash(password)
+    return password_context().hash(password)
 
-def authenticate_user(provided_password: str, user_password) -> None:
-    if not verify_password(provided_password, user_password):
+def password_needs_update(hashed_password: str) -> bool:
+    return password_context().needs_update(hashed_password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    return await password_executor.run(hash_password, password)
+
+async def authenticate_user(provided_password: str, user_password) -> None:
+    if not await verify_password_async(provided_password, user_password):
         raise Unauthorized("Invalid password")
     
 
+@asynccontextmanager
+async def password_executor_lifespan(app: FastAPI):
+    # Calibrating at startup keeps its timing runs off the first login
+    await password_executor.run(password_context)
+    yield
+    await password_rehashes.drain()
+    password_executor.shutdown()
+
 def init_security(app: FastAPI):
-    app.add_middleware(CORSMiddleware, allow_credentials=True, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    add_lifespan(app, password_executor_lifespan)
+    metrics.register_stats("password_executor", password_executor.stats)
+    metrics.register_stats("password_rehashes", password_rehashes.stats)
+    metrics.register_stats("token_cache", verified_tokens.stats)
+    app.add_middleware(CORSMiddleware, allow_credentials=True, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_MODE_HEADER, ETAG_HEADER, REQUEST_ID_HEADER])
 
     if not settings.DEBUG:
+        from fastapi.middleware.trustedhost import TrustedHostMiddleware
+        from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
+
         app.add_middleware(HTTPSRedirectMiddleware)
         app.add_middleware(TrustedHostMiddleware, allowed_hosts=[settings.JWT_TOKEN_AUDIENCE])
         
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,14 +7,49 @@ class Settings(BaseSettings):
 
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
+    API_WORKERS: int = 0
+    API_KEEP_ALIVE: int = 5
+    API_BACKLOG: int = 2048
+    API_GRACEFUL_SHUTDOWN: int = 30
     API_KEY: str = "top_secret_token"
     API_KEY_NAME: str = "x-api-key"
+    FAST_RESPONSES: bool = False
 
     DB_HOST: str = "localhost"
     DB_PORT: int = 5432
     DB_USERNAME: str = "postgres"
     DB_PASSWORD: str = "rootpassword"
     DB_DATABASE: str = "postgres"
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_MAX_QUERIES: int = 50_000
+    DB_POOL_MAX_IDLE_TIME: float = 300.0
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    DB_MAX_CONNECTIONS: int = 90
+    DB_REPLICAS: list[str] = []
+    DB_REPLICA_SELECTION: Literal["round_robin", "least_busy"] = "round_robin"
+    DB_REPLICA_RETRY_AFTER: float = 5.0
+    DB_CACHE_SIZE: int = 10_000
+    DB_CACHE_TTL: int = 30
+    COUNT_CACHE_SIZE: int = 1_000
+    COUNT_CACHE_TTL: int = 10
+
+    # get() calls made within this window, across requests, are resolved with one query
+    DB_BATCH_WINDOW_MS: float = 1.0
+    DB_BATCH_MAX_SIZE: int = 1000
+
+    # Requests running more queries than this are logged as a warning; 0 turns it off
+    DB_QUERY_WARN_THRESHOLD: int = 10
+
+    # Responses smaller than this are sent uncompressed; streamed responses are always compressed
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10_000
+    # Share of requests written to the access log per status class; missing classes are always logged
+    LOG_ACCESS_SAMPLE_RATES: dict[str, float] = {"2xx": 0.01, "3xx": 0.01}
 
     JWT_KEY_NAME: str = 'token'
     JWT_AUTH_SECRET: str = 'top_secret_token'
@@ -20,7 +57,27 @@ class Settings(BaseSettings):
     JWT_TOKEN_AUDIENCE: str = 'http://localhost:8080'
     JWT_TOKEN_ISSUER: str = 'http://localhost:8080'
     JWT_EXPIRES: int = 60 * 60 * 24
+    JWT_CACHE_SIZE: int = 10_000
+
+    PASSWORD_HASH_WORKERS: int = 4
+    # The first scheme hashes new passwords, the rest are still accepted and rehashed on login
+    PASSWORD_SCHEMES: list[Literal["bcrypt", "argon2"]] = ["bcrypt"]
+    PASSWORD_HASH_TARGET_MS: float = 250
+    # 0 calibrates the cost against PASSWORD_HASH_TARGET_MS at startup
+    PASSWORD_HASH_ROUNDS: int = 0
+    PASSWORD_ARGON2_MEMORY_COST: int = 64 * 1024
+    PASSWORD_ROUTES_CONCURRENCY: int = 8
+    PASSWORD_ROUTES_QUEUE: int = 32
+    PASSWORD_ROUTES_QUEUE_TIMEOUT: float = 2.0
+    ADMISSION_RETRY_AFTER: int = 1
     
+    @property
+    def workers(self) -> int:
+        # DEBUG runs a single reloading process; otherwise one worker per CPU unless API_WORKERS is set
+        if self.DEBUG:
+            return 1
+        return self.API_WORKERS or os.cpu_count() or 1
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,62 @@
+import asyncio
+from typing import AsyncIterator, Optional
+from fastapi import Depends
+from ..exceptions import ServiceUnavailable
+
+
+class AdmissionLimiter:
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float, retry_after: int = 1) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    def _reject(self, reason: str) -> ServiceUnavailable:
+        self.shed += 1
+        return ServiceUnavailable(f"{self.name} {reason}", self.retry_after)
+
+    async def admit(self) -> AsyncIterator[None]:
+        # Over the limit a request waits in a bounded queue; a full queue or a long wait is shed with a 503 right away
+        if self._slots.locked():
+            if self.waiting >= self.queue_size:
+                raise self._reject("is at capacity")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise self._reject("queue timed out")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+
+def admission(limiter: Optional[AdmissionLimiter]) -> list:
+    return [Depends(limiter.admit)] if limiter else []
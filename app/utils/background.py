@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        # The loop only keeps weak references to tasks, so running ones are held here
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def run_once(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> None:
+        # Work already running for the same key isn't started a second time
+        if key in self._tasks:
+            self.skipped += 1
+            return
+
+        self.started += 1
+        task = asyncio.ensure_future(func())
+        self._tasks[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        self._tasks.pop(key, None)
+
+        if task.cancelled():
+            self.failed += 1
+        elif task.exception() is not None:
+            self.failed += 1
+            logger.error("Background task %s failed for %r", self.name, key, exc_info=task.exception())
+        else:
+            self.completed += 1
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._tasks),
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
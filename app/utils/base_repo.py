@@ -1,85 +1,567 @@
-from typing import TypeVar, Type, Optional, Any
+import json
+from dataclasses import dataclass
+from functools import partial
+from typing import TypeVar, Type, Optional, Any, AsyncIterator, Awaitable, Callable
+from tortoise import timezone
 from tortoise.models import Model
 from tortoise.exceptions import DoesNotExist, IntegrityError
+from tortoise.transactions import in_transaction
+from tortoise.queryset import QuerySet
+from tortoise.backends.base.client import BaseDBAsyncClient
 from ..exceptions import ResourceNotFound, ResourceAlreadyExists
+from .pagination import CountMode, apply_keyset, next_cursor
+from .cache import CacheBackend
+from .singleflight import SingleFlight
+from .loader import BatchLoader
+from .replicas import ReplicaRouter, pin_primary, read_from_primary
+from .filters import FilterSpec
 
 M = TypeVar('M', bound=Model)
 
+CREATED = "created"
+UPDATED = "updated"
+CONFLICT = "conflict"
+NOT_FOUND = "not_found"
+
+@dataclass(frozen=True, slots=True)
+class BulkItemResult:
+    status: str
+    item: Optional[Model] = None
+
+def detach(result: Any) -> Any:
+    if isinstance(result, dict):
+        return dict(result)
+    if isinstance(result, list):
+        return [dict(item) if isinstance(item, dict) else item for item in result]
+    return result
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 class BaseRepository:
     model: Type[Model]
     related_models: list[str] = []
+    sort_key: str = "id"
+    version_field: Optional[str] = None
+    filter_spec: FilterSpec = FilterSpec()
+    cache: Optional[CacheBackend] = None
+    count_cache: Optional[CacheBackend] = None
+    flights: Optional[SingleFlight] = None
+    loader: Optional[BatchLoader] = None
+    replicas: Optional[ReplicaRouter] = None
+    bulk_batch_size: int = 1000
+    export_chunk_size: int = 1000
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        model = getattr(cls, "model", None)
+        if model is None:
+            return
+
+        # Keyset pagination compares with > and =, which never match NULL, so paging by a nullable key would drop rows
+        nullable = [key for key in (cls.sort_key, *cls.filter_spec.sort_keys) if model._meta.fields_map[key].null]
+        if nullable:
+            raise TypeError(f"{cls.__name__} can't sort by nullable fields: {', '.join(nullable)}")
 
     def __error_message(self) -> str:
         return f"{self.model.__name__}"
 
-    async def get_all(
-            self, 
-            *,
-            skip: int = 0, 
-            limit: int = 100, 
-            filter: Optional[dict[str, Any]] = None
-        ) -> list[Model]:
+    def _cache_key(self, id: Any) -> str:
+        return f"{self.model.__name__}:{id}"
 
-        items = self.model.all().prefetch_related(*self.related_models)
+    def _filter_cache_key(self, filter: dict[str, Any]) -> Optional[str]:
+        # Only plain equality lookups are cached; they resolve to an id and are re-checked against the entity
+        if any("__" in field for field in filter):
+            return None
+        return f"{self.model.__name__}:filter:{sorted(filter.items())!r}"
 
-        if skip:
-            items = items.offset(skip)
-        
-        if limit:
-            items  = items.limit(limit)
+    def _count_cache_key(self, filter: dict[str, Any]) -> str:
+        return f"{self.model.__name__}:count:{sorted(filter.items())!r}"
 
-        if filter:
-            items = items.filter(**filter)
-                
-        return await items
+    async def _invalidate_counts(self) -> None:
+        if self.count_cache is not None:
+            await self.count_cache.clear()
 
-    async def filter(self, **filter: dict[str, Any]) -> Model:
-        try:
-            query = self.model.get(**filter)
-            if self.related_models:
-               query.prefetch_related(*self.related_models)
-            item = await query
+    async def _coalesce(self, key: tuple, func: Callable[[], Awaitable[Any]]) -> Any:
+        # Identical concurrent reads share one query; the key is rendered so unhashable filter values work
+        if self.flights is None:
+            return await func()
+        # Reads pinned to the primary must not join a flight that may be served by a lagging replica
+        return await self.flights.do(repr((*key, read_from_primary.get())), func, copy=detach)
+
+    async def _read(self, read: Callable[[Optional[BaseDBAsyncClient]], Awaitable[Any]]) -> Any:
+        if self.replicas is None:
+            return await read(None)
+        return await self.replicas.run(read)
+
+    def _after_write(self) -> None:
+        pin_primary()
+        if self.flights is not None:
+            self.flights.forget()
+
+    async def _cache_item(self, item: Model) -> None:
+        if self.cache is not None:
+            await self.cache.set(self._cache_key(item.pk), item)
 
+    def _auto_now_fields(self) -> list[str]:
+        return [name for name, field in self.model._meta.fields_map.items() if getattr(field, "auto_now", False)]
+
+    def row_version(self, item: Model | dict[str, Any]) -> tuple[Any, Any]:
+        if isinstance(item, dict):
+            return item["id"], item[self.version_field]
+        return item.pk, getattr(item, self.version_field)
+
+    @staticmethod
+    def _project(item: Model, fields: Optional[list[str]]) -> Model | dict[str, Any]:
+        return {field: getattr(item, field) for field in fields} if fields else item
+
+    async def _get_values(self, fields: list[str], **filter: Any) -> dict[str, Any]:
+        try:
+            return await self._read(lambda db: self.model.all().using_db(db).get(**filter).values(*dict.fromkeys(fields)))
         except DoesNotExist:
             raise ResourceNotFound(self.__error_message())
 
-        return item
+    async def _fetch(self, **filter: Any) -> Model:
+        def read(db: Optional[BaseDBAsyncClient]):
+            query = self.model.all().using_db(db).get(**filter)
+            return query.prefetch_related(*self.related_models) if self.related_models else query
 
-    async def get(self, id: int) -> Model:
         try:
-            query = self.model.get(id=id)
-            
-            if self.related_models:
-                query.prefetch_related(*self.related_models)
-            
-            item = await query
+            return await self._read(read)
 
         except DoesNotExist:
             raise ResourceNotFound(self.__error_message())
 
+    async def _select_many(self, ids: list[Any], db: Optional[BaseDBAsyncClient]) -> list[Model]:
+        db = db or self.model._meta.db
+        if self.related_models or db.capabilities.dialect != "postgres":
+            return await self.model.filter(pk__in=ids).using_db(db).prefetch_related(*self.related_models)
+
+        # One array parameter keeps a single prepared statement for every batch size, where IN (...) needs one per size
+        meta = self.model._meta
+        rows = await db.execute_query_dict(f'SELECT * FROM "{meta.db_table}" WHERE "{meta.db_pk_column}" = ANY($1)', [ids])
+        return [self.model._init_from_db(**row) for row in rows]
+
+    async def _fetch_many(self, primary: bool, ids: list[Any]) -> dict[Any, Model]:
+        # The batch runs in the context of whoever opened it, so the caller's primary pin is restored explicitly
+        token = read_from_primary.set(primary)
+        try:
+            items = await self._read(partial(self._select_many, ids))
+        finally:
+            read_from_primary.reset(token)
+        return {item.pk: item for item in items}
+
+    async def _load(self, id: Any) -> Model:
+        if self.loader is None:
+            return await self._coalesce(("filter", [("id", id)]), partial(self._fetch, id=id))
+
+        # Pinned and unpinned reads are batched apart, so a pinned read never lands on a replica
+        primary = read_from_primary.get()
+        item = await self.loader.load(primary, self.model._meta.pk.to_python_value(id), partial(self._fetch_many, primary))
+        if item is None:
+            raise ResourceNotFound(self.__error_message())
         return item
 
+    def list_query(
+            self,
+            *,
+            skip: int = 0,
+            limit: int = 100,
+            filter: Optional[dict[str, Any]] = None,
+            after: Optional[str] = None,
+            fields: Optional[list[str]] = None,
+            sort: Optional[str] = None,
+            db: Optional[BaseDBAsyncClient] = None
+        ) -> QuerySet:
+
+        sort_key = self.filter_spec.resolve_sort(sort, self.sort_key)
+        filter = self.filter_spec.resolve(filter, self.model)
+
+        items = self.model.all().using_db(db)
+        if not fields:
+            items = items.prefetch_related(*self.related_models)
+
+        if filter:
+            items = items.filter(**filter)
+
+        items = apply_keyset(items, sort_key, after)
+
+        if skip and not after:
+            items = items.offset(skip)
+        
+        if limit:
+            items  = items.limit(limit)
+
+        if fields:
+            # Plain rows of the requested columns; the sort key and id are kept for the next cursor
+            items = items.values(*dict.fromkeys([*fields, sort_key, "id"]))
+
+        return items
+
+    async def get_all(
+            self, 
+            *,
+            skip: int = 0, 
+            limit: int = 100, 
+            filter: Optional[dict[str, Any]] = None,
+            after: Optional[str] = None,
+            fields: Optional[list[str]] = None,
+            sort: Optional[str] = None
+        ) -> list[Model] | list[dict[str, Any]]:
+                
+        key = ("get_all", skip, limit, sorted((filter or {}).items()), after, fields, sort)
+        def read(db: Optional[BaseDBAsyncClient]):
+            return self.list_query(skip=skip, limit=limit, filter=filter, after=after, fields=fields, sort=sort, db=db)
+
+        return await self._coalesce(key, partial(self._read, read))
+
+    async def count(self, filter: Optional[dict[str, Any]] = None, mode: CountMode = "exact") -> int:
+        filter = self.filter_spec.resolve(filter, self.model)
+
+        if mode == "estimate":
+            estimate = await self._estimate_count(filter)
+            if estimate is not None:
+                return estimate
+
+        return await self._exact_count(filter)
+
+    async def _exact_count(self, filter: dict[str, Any]) -> int:
+        key = self._count_cache_key(filter)
+
+        if self.count_cache is not None:
+            total = await self.count_cache.get(key)
+            if total is not None:
+                return total
+
+        total = await self._read(lambda db: self.model.filter(**filter).using_db(db).count())
+
+        if self.count_cache is not None:
+            await self.count_cache.set(key, total)
+
+        return total
+
+    async def _estimate_count(self, filter: dict[str, Any]) -> Optional[int]:
+        # Planner statistics only exist on PostgreSQL; other backends fall back to the cached exact count
+        connection = self.model._meta.db
+        if connection.capabilities.dialect != "postgres":
+            return None
+
+        if filter:
+            plan = (await self.model.filter(**filter).explain())[0]["QUERY PLAN"]
+            estimate = json.loads(plan)[0]["Plan"]["Plan Rows"]
+        else:
+            rows = await connection.execute_query_dict(
+                "SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = to_regclass(quote_ident($1))",
+                [self.model._meta.db_table],
+            )
+            estimate = rows[0]["estimate"] if rows else None
+
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    def next_cursor(self, items: list[Any], limit: Optional[int], sort: Optional[str] = None) -> Optional[str]:
+        return next_cursor(items, sort or self.sort_key, limit)
+
+    def stream(
+            self,
+            *,
+            fields: list[str],
+            filter: Optional[dict[str, Any]] = None
+        ) -> AsyncIterator[list[dict[str, Any]]]:
+        # Resolved before the generator starts: once the response has begun streaming, a bad filter can't become a 400
+        return self._stream_chunks(fields, self.filter_spec.resolve(filter, self.model))
+
+    async def _stream_chunks(self, fields: list[str], filter: dict[str, Any]) -> AsyncIterator[list[dict[str, Any]]]:
+        # Walks the table in keyset-paginated chunks so only one chunk of plain rows is held at a time
+        columns = list(dict.fromkeys([*fields, self.sort_key, "id"]))
+        after = None
+
+        def read_chunk(db: Optional[BaseDBAsyncClient]):
+            items = self.model.filter(**filter).using_db(db)
+            return apply_keyset(items, self.sort_key, after).limit(self.export_chunk_size).values(*columns)
+
+        while True:
+            rows = await self._read(read_chunk)
+            if not rows:
+                return
+
+            after = self.next_cursor(rows, self.export_chunk_size)
+
+            if len(columns) != len(fields):
+                rows = [{field: row[field] for field in fields} for row in rows]
+            yield rows
+
+            if after is None:
+                return
+
+    async def filter(self, *, fields: Optional[list[str]] = None, **filter: dict[str, Any]) -> Model | dict[str, Any]:
+        filter_key = self._filter_cache_key(filter) if self.cache is not None else None
+
+        if filter_key is None and fields:
+            return await self._coalesce(("values", fields, sorted(filter.items())), partial(self._get_values, fields, **filter))
+
+        if filter_key is not None:
+            id = await self.cache.get(filter_key)
+            item = await self.cache.get(self._cache_key(id)) if id is not None else None
+            if item is not None and all(getattr(item, field, None) == value for field, value in filter.items()):
+                return self._project(item, fields)
+
+        item = await self._coalesce(("filter", sorted(filter.items())), partial(self._fetch, **filter))
+
+        if filter_key is not None:
+            await self.cache.set(filter_key, item.pk)
+            await self._cache_item(item)
+
+        return self._project(item, fields)
+
+    async def get(self, id: int, fields: Optional[list[str]] = None, version: Optional[tuple[Any, Any]] = None) -> Model | dict[str, Any]:
+        # Cached repositories keep whole entities and project them in memory; a hit beats any narrower query
+        if self.cache is None and self.loader is None and fields:
+            return await self._coalesce(("values", fields, [("id", id)]), partial(self._get_values, fields, id=id))
+
+        if self.cache is not None:
+            item = await self.cache.get(self._cache_key(id))
+            # A `version` just read from the database means the cached copy is only good if it is that version
+            if item is not None and (version is None or self.row_version(item) == version):
+                return self._project(item, fields)
+
+        item = await self._load(id)
+
+        await self._cache_item(item)
+
+        return self._project(item, fields)
+
+    async def get_many(self, ids: list[int], fields: Optional[list[str]] = None) -> list[Model | dict[str, Any]]:
+        # Items come back in the order of `ids`; unknown ids are left out
+        ids = list(dict.fromkeys(self.model._meta.pk.to_python_value(id) for id in ids))
+        found = {}
+
+        if self.cache is not None:
+            for id in ids:
+                item = await self.cache.get(self._cache_key(id))
+                if item is not None:
+                    found[id] = item
+
+        missing = [id for id in ids if id not in found]
+        if missing:
+            primary = read_from_primary.get()
+            if self.loader is not None:
+                loaded = dict(zip(missing, await self.loader.load_many(primary, missing, partial(self._fetch_many, primary))))
+            else:
+                loaded = await self._fetch_many(primary, missing)
+
+            for id, item in loaded.items():
+                if item is not None:
+                    found[id] = item
+                    await self._cache_item(item)
+
+        return [self._project(found[id], fields) for id in ids if id in found]
+
+    async def version(self, id: int) -> tuple[Any, Any]:
+        # Always read from the database: the cache is per process and may hold a row another worker has since changed,
+        # which would answer 304 for stale content
+        fields = ["id", self.version_field]
+        row = await self._coalesce(("values", fields, [("id", id)]), partial(self._get_values, fields, id=id))
+        return self.row_version(row)
+
+    async def list_versions(
+            self,
+            *,
+            skip: int = 0,
+            limit: int = 100,
+            filter: Optional[dict[str, Any]] = None,
+            after: Optional[str] = None,
+            sort: Optional[str] = None
+        ) -> list[tuple[Any, Any]]:
+
+        rows = await self.get_all(skip=skip, limit=limit, filter=filter, after=after, fields=["id", self.version_field], sort=sort)
+        return [self.row_version(row) for row in rows]
+
+    async def _insert(self, connection: Any, items: list[dict[str, Any]]) -> list[BulkItemResult]:
+        meta = self.model._meta
+        executor = connection.executor_class(model=self.model, db=connection)
+        columns = [name for name in meta.fields_db_projection if not meta.fields_map[name].generated]
+        db_columns = [meta.fields_db_projection[name] for name in columns]
+        conflict_fields = self._conflict_fields()
+
+        query = connection.query_class.into(meta.basetable).columns(*db_columns)
+        values, keys = [], []
+
+        for item in items:
+            instance = self.model(**item)
+            row = [meta.fields_map[name].to_db_value(getattr(instance, name), instance) for name in columns]
+            query = query.insert(*[executor.parameter(len(values) + i) for i in range(len(row))])
+            values.extend(row)
+            keys.append(tuple(getattr(instance, name) for name in conflict_fields))
+
+        # Rows skipped by ON CONFLICT are simply missing from RETURNING, which is how conflicts are detected
+        query = query.on_conflict().do_nothing().returning("*")
+        rows = await connection.execute_query_dict(str(query), values)
+
+        # Keyed on every column a unique constraint covers, so a row matches only the input it came from
+        # (among inputs equal on all of them, only the first can have been inserted)
+        inserted = {}
+        for row in rows:
+            created = self.model._init_from_db(**row)
+            inserted.setdefault(tuple(getattr(created, name) for name in conflict_fields), []).append(created)
+
+        results = []
+        for key in keys:
+            matches = inserted.get(key)
+            if matches:
+                results.append(BulkItemResult(CREATED, matches.pop(0)))
+            else:
+                results.append(BulkItemResult(CONFLICT))
+
+        return results
+
     async def create(self, **kwargs: dict[str, Any]) -> Model:
         try:
-            new_item = await self.model.create(**kwargs)
-        except DoesNotExist as e:
-            print(f"DoesNotExist: {e}")
-        except IntegrityError as e:
+            [result] = await self._insert(self.model._meta.db, [kwargs])
+        except IntegrityError:
+            raise ResourceAlreadyExists(self.__error_message())
+
+        if result.status == CONFLICT:
             raise ResourceAlreadyExists(self.__error_message())
+
+        await self._cache_item(result.item)
+        await self._invalidate_counts()
+        self._after_write()
         
-        return new_item
+        return result.item
+
+    async def update(self, id: int, *, expected: Optional[dict[str, Any]] = None, **kwargs: dict[str, Any]) -> Model:
+        # `expected` makes the update conditional on the row's current values; a mismatch is a ResourceNotFound
+        if not kwargs:
+            return await self.get(id)
+
+        for name in self._auto_now_fields():
+            kwargs.setdefault(name, timezone.now())
+
+        meta = self.model._meta
+        connection = meta.db
+        executor = connection.executor_class(model=self.model, db=connection)
+        query = connection.query_class.update(meta.basetable)
+        values = []
+
+        for name, value in kwargs.items():
+            query = query.set(meta.fields_db_projection[name], executor.parameter(len(values)))
+            values.append(meta.fields_map[name].to_db_value(value, None))
+
+        query = query.where(meta.basetable[meta.db_pk_column] == executor.parameter(len(values)))
+        values.append(meta.pk.to_db_value(id, None))
+
+        for name, value in (expected or {}).items():
+            query = query.where(meta.basetable[meta.fields_db_projection[name]] == executor.parameter(len(values)))
+            values.append(meta.fields_map[name].to_db_value(value, None))
+
+        query = query.returning("*")
 
-    async def update(self, id: int, **kwargs: dict[str, Any]) -> None:
         try:
-            await self.model.filter(id=id).update(**kwargs)
-            updated_item = await self.model.get(id=id)
-        except DoesNotExist:
+            rows = await connection.execute_query_dict(str(query), values)
+        except IntegrityError:
+            raise ResourceAlreadyExists(self.__error_message())
+
+        if not rows:
             raise ResourceNotFound(self.__error_message())
 
+        updated_item = self.model._init_from_db(**rows[0])
+        await self._cache_item(updated_item)
+        # Filtered totals can change with any updated column
+        await self._invalidate_counts()
+        self._after_write()
+
         return updated_item
     
+    def _unique_fields(self) -> list[str]:
+        fields_map = self.model._meta.fields_map
+        return [name for name in self.model._meta.fields_db_projection if fields_map[name].unique and not fields_map[name].pk]
+
+    def _conflict_fields(self) -> list[str]:
+        # Every field ON CONFLICT DO NOTHING may skip a row on: a supplied primary key, unique fields and unique_together
+        meta = self.model._meta
+        fields = [] if meta.pk.generated else [meta.pk_attr]
+        fields.extend(self._unique_fields())
+        for together in meta.unique_together:
+            # unique_together may name a relation; its key is stored in the source field
+            fields.extend(meta.fields_map[name].source_field or name for name in together)
+        return list(dict.fromkeys(fields))
+
+    async def create_many(self, items: list[dict[str, Any]]) -> list[BulkItemResult]:
+        results: list[BulkItemResult] = []
+
+        try:
+            async with in_transaction(self.model._meta.default_connection) as connection:
+                for batch in chunked(items, self.bulk_batch_size):
+                    results.extend(await self._insert(connection, batch))
+
+        except IntegrityError:
+            raise ResourceAlreadyExists(self.__error_message())
+
+        for result in results:
+            if result.item is not None:
+                await self._cache_item(result.item)
+
+        await self._invalidate_counts()
+        self._after_write()
+
+        return results
+
+    async def update_many(self, items: list[dict[str, Any]]) -> list[BulkItemResult]:
+        fields = [name for name in items[0] if name != "id"] if items else []
+        unique_fields = [name for name in self._unique_fields() if name in fields]
+        statuses: list[str] = []
+        updates: dict[Any, dict[str, Any]] = {}
+
+        try:
+            async with in_transaction(self.model._meta.default_connection) as connection:
+                query = self.model.filter(id__in=[item["id"] for item in items]).using_db(connection)
+                existing = set(await query.values_list("id", flat=True))
+                owners = {}
+                for field in unique_fields:
+                    values = [item[field] for item in items]
+                    owners[field] = dict(await self.model.filter(**{f"{field}__in": values}).using_db(connection).values_list(field, "id"))
+
+                for item in items:
+                    id = item["id"]
+                    if id not in existing:
+                        statuses.append(NOT_FOUND)
+                    elif id in updates or any(owners[field].get(item[field], id) != id for field in unique_fields):
+                        statuses.append(CONFLICT)
+                    else:
+                        for field in unique_fields:
+                            owners[field][item[field]] = id
+                        updates[id] = item
+                        statuses.append(UPDATED)
+
+                if updates and fields:
+                    instances = [self.model(**item) for item in updates.values()]
+                    await self.model.bulk_update(instances, fields=[*fields, *self._auto_now_fields()], batch_size=self.bulk_batch_size, using_db=connection)
+
+                updated = {item.pk: item for item in await self.model.filter(id__in=list(updates)).using_db(connection)} if updates else {}
+
+        except IntegrityError:
+            raise ResourceAlreadyExists(self.__error_message())
+
+        for item in updated.values():
+            await self._cache_item(item)
+
+        if updated:
+            await self._invalidate_counts()
+        self._after_write()
+
+        return [BulkItemResult(status, updated.get(item["id"]) if status == UPDATED else None)
+                for status, item in zip(statuses, items)]
+
     async def delete(self, id: int) -> None:
         try:
             await self.model.filter(id=id).delete()
         except DoesNotExist:
             raise ResourceNotFound(self.__error_message())
+
+        if self.cache is not None:
+            await self.cache.delete(self._cache_key(id))
+
+        await self._invalidate_counts()
+        self._after_write()
@@ -0,0 +1,112 @@
+import zlib
+from time import thread_time_ns
+from typing import Callable, Optional
+from .metrics import metrics
+
+# brotli is optional; without it only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Media types worth compressing; everything else (images, already compressed archives) is sent as is
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+
+
+class EncodingStats:
+    # Counts output bytes and the CPU spent producing them; compressors also count their input bytes
+    def __init__(self) -> None:
+        self.calls = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_ns = 0
+
+    def record(self, bytes_out: int, cpu_ns: int, bytes_in: int = 0) -> None:
+        self.calls += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.cpu_ns += cpu_ns
+
+    def stats(self) -> dict:
+        stats = {"calls": self.calls, "bytes_out": self.bytes_out, "cpu_seconds": self.cpu_ns / 1e9}
+        if self.bytes_in:
+            stats["bytes_in"] = self.bytes_in
+            stats["ratio"] = self.bytes_out / self.bytes_in
+        return stats
+
+
+_encoding_stats: dict[str, EncodingStats] = {}
+
+def encoding_stats(name: str) -> EncodingStats:
+    stats = _encoding_stats.get(name)
+    if stats is None:
+        stats = _encoding_stats[name] = EncodingStats()
+        metrics.register_stats(f"encoding_{name}", stats.stats)
+    return stats
+
+def timed(name: str, encode: Callable[[], bytes], bytes_in: int = 0) -> bytes:
+    # thread_time measures this thread's CPU only, so time spent waiting on other tasks isn't counted
+    start = thread_time_ns()
+    encoded = encode()
+    encoding_stats(name).record(len(encoded), thread_time_ns() - start, bytes_in)
+    return encoded
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # A sync flush per chunk lets the client decode streamed bodies as they arrive
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+def parse_accept(header: str) -> dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        value, _, params = part.partition(";")
+        value = value.strip().lower()
+        if value:
+            accepted[value] = max(accepted.get(value, 0.0), _quality(params))
+    return accepted
+
+def available_encodings() -> tuple[str, ...]:
+    # In order of preference when the client accepts several equally
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate_encoding(header: Optional[str]) -> Optional[str]:
+    if not header:
+        return None
+
+    accepted = parse_accept(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def create_encoder(encoding: str, gzip_level: int, brotli_quality: int) -> GzipEncoder | BrotliEncoder:
+    return BrotliEncoder(brotli_quality) if encoding == "br" else GzipEncoder(gzip_level)
+
+def compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
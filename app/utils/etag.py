@@ -0,0 +1,42 @@
+import hashlib
+from typing import Any, Awaitable, Callable, Optional
+from fastapi import Request, Response, status
+from starlette.datastructures import MutableHeaders
+
+ETAG_HEADER = "ETag"
+
+
+def make_etag(version: Any) -> str:
+    # Strong validator over (id, version) pairs; hashing keeps it short and doesn't expose the raw versions
+    digest = hashlib.blake2b(repr(version).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers[ETAG_HEADER] = etag
+
+def weaken_etag(headers: MutableHeaders) -> None:
+    # For bodies whose bytes differ from the identity JSON (compressed, MessagePack) but hold the same rows
+    etag = headers.get(ETAG_HEADER)
+    if etag and not etag.startswith("W/"):
+        headers[ETAG_HEADER] = f"W/{etag}"
+
+async def not_modified(request: Request, version: Callable[[], Awaitable[Any]]) -> tuple[Optional[Response], Any]:
+    # Answered from a version-only query, so an unchanged resource is never loaded or serialized.
+    # The version read is returned too, so a changed resource isn't then served from an older cached copy.
+    if not request.headers.get("if-none-match"):
+        return None, None
+
+    current = await version()
+    etag = make_etag(current)
+    if not etag_matches(request, etag):
+        return None, current
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag}), current
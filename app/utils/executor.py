@@ -0,0 +1,57 @@
+import time
+import asyncio
+from typing import Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, name: str) -> None:
+        self.max_workers = max_workers
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        submitted_at = time.perf_counter()
+
+        def job():
+            return time.perf_counter() - submitted_at, func(*args)
+
+        self.in_flight += 1
+        try:
+            wait_time, result = await asyncio.get_running_loop().run_in_executor(self.executor, job)
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "wait_seconds_total": self.wait_time_total,
+            "wait_seconds_max": self.wait_time_max,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
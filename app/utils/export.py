@@ -0,0 +1,48 @@
+import io
+import csv
+import json
+from typing import Any, AsyncIterator, Literal
+import ormsgpack
+from fastapi.responses import StreamingResponse
+
+ExportFormat = Literal["ndjson", "csv", "msgpack"]
+Chunks = AsyncIterator[list[dict[str, Any]]]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "msgpack": "application/msgpack",
+}
+
+
+async def ndjson_lines(chunks: Chunks) -> AsyncIterator[bytes]:
+    encoder = json.JSONEncoder(default=str, separators=(",", ":"))
+    async for rows in chunks:
+        yield "".join(encoder.encode(row) + "\n" for row in rows).encode()
+
+async def csv_lines(chunks: Chunks, fields: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+
+    async for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+async def msgpack_rows(chunks: Chunks) -> AsyncIterator[bytes]:
+    # A stream of concatenated maps, one per row, which msgpack Unpackers read incrementally
+    async for rows in chunks:
+        yield b"".join(ormsgpack.packb(row) for row in rows)
+
+def export_response(chunks: Chunks, fields: list[str], format: ExportFormat, filename: str) -> StreamingResponse:
+    if format == "csv":
+        body = csv_lines(chunks, fields)
+    elif format == "msgpack":
+        body = msgpack_rows(chunks)
+    else:
+        body = ndjson_lines(chunks)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
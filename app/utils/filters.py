@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Optional, Type
+from tortoise.fields import Field
+from tortoise.models import Model
+from ..exceptions import BadRequest
+
+OPERATORS = ("eq", "prefix", "range", "in")
+MAX_IDS = 1000
+MAX_IN_VALUES = MAX_IDS
+
+Convert = Callable[[Any], Any]
+
+
+def coerce_value(model_field: Field, value: Any) -> Any:
+    # Raises ValueError for anything the column can't hold, so callers answer 400 instead of failing in the driver
+    if value is None and model_field.null:
+        return None
+    if not isinstance(value, (str, int, float, bool)):
+        raise ValueError(f"Unsupported value {value!r}")
+
+    try:
+        converted = model_field.to_python_value(value)
+    except TypeError as e:
+        raise ValueError(str(e))
+
+    constraints = model_field.constraints
+    if "ge" in constraints and converted < constraints["ge"] or "le" in constraints and converted > constraints["le"]:
+        raise ValueError(f"{value!r} is out of range")
+    if "max_length" in constraints and len(converted) > constraints["max_length"]:
+        raise ValueError(f"{value!r} is too long")
+    return converted
+
+def _split(value: Any) -> list:
+    return list(value) if isinstance(value, (list, tuple)) else str(value).split(",")
+
+def _eq(name: str, value: Any, convert: Convert) -> dict[str, Any]:
+    return {name: convert(value)}
+
+def _prefix(name: str, value: Any, convert: Convert) -> dict[str, Any]:
+    return {f"{name}__startswith": convert(value)}
+
+def _range(name: str, value: Any, convert: Convert) -> dict[str, Any]:
+    bounds = _split(value)
+    if len(bounds) != 2:
+        raise BadRequest(f"Range filter on '{name}' expects 'min,max'")
+
+    low, high = bounds
+    resolved = {}
+    if low not in (None, ""):
+        resolved[f"{name}__gte"] = convert(low)
+    if high not in (None, ""):
+        resolved[f"{name}__lte"] = convert(high)
+    return resolved
+
+def _in(name: str, value: Any, convert: Convert) -> dict[str, Any]:
+    values = _split(value)
+    if len(values) > MAX_IN_VALUES:
+        raise BadRequest(f"'in' filter on '{name}' accepts at most {MAX_IN_VALUES} values")
+    return {f"{name}__in": [convert(item) for item in values]}
+
+RESOLVERS = {"eq": _eq, "prefix": _prefix, "range": _range, "in": _in}
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    fields: dict[str, tuple[str, ...]] = field(default_factory=lambda: {"id": ("eq", "in", "range")})
+    sort_keys: tuple[str, ...] = ("id",)
+
+    def resolve(self, filter: Optional[dict[str, Any]], model: Type[Model]) -> dict[str, Any]:
+        resolved = {}
+
+        for key, value in (filter or {}).items():
+            name, _, operator = key.partition("__")
+            operator = operator or "eq"
+
+            if operator not in self.fields.get(name, ()):
+                raise BadRequest(f"Filtering by '{name}' with '{operator}' is not supported")
+
+            try:
+                resolved.update(RESOLVERS[operator](name, value, partial(coerce_value, model._meta.fields_map[name])))
+            except ValueError as e:
+                raise BadRequest(f"Invalid value for '{name}': {e}")
+
+        return resolved
+
+    def resolve_sort(self, sort: Optional[str], default: str) -> str:
+        if sort is None:
+            return default
+
+        if sort not in self.sort_keys:
+            raise BadRequest(f"Sorting by '{sort}' is not supported")
+
+        return sort
+
+
+def filter_from_query(filter: Optional[str], filter_value: Optional[str], filter_op: str = "eq") -> Optional[dict[str, Any]]:
+    if not filter:
+        return None
+
+    key = filter if filter_op == "eq" else f"{filter}__{filter_op}"
+    return {key: filter_value}
+
+def ids_from_query(ids: Optional[str]) -> Optional[list[int]]:
+    if not ids:
+        return None
+
+    try:
+        parsed = [int(id) for id in ids.split(",")]
+    except ValueError:
+        raise BadRequest("'ids' expects comma separated integers")
+
+    if len(parsed) > MAX_IDS:
+        raise BadRequest(f"At most {MAX_IDS} ids can be requested at once")
+    return parsed
@@ -0,0 +1,18 @@
+from typing import Callable, AsyncContextManager
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+
+Lifespan = Callable[[FastAPI], AsyncContextManager]
+
+
+def add_lifespan(app: FastAPI, lifespan: Lifespan) -> None:
+    original_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def merged_lifespan(app_instance: FastAPI):
+        # Lifespans start in registration order and stop in reverse, so later ones can rely on earlier ones
+        async with original_lifespan(app_instance) as state:
+            async with lifespan(app_instance):
+                yield state
+
+    app.router.lifespan_context = merged_lifespan
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+# Resolves a batch of keys; keys missing from the result load as None
+Resolver = Callable[[list[Hashable]], Awaitable[dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    def __init__(self, window: float = 0.001, max_batch: int = 1000) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.loads = 0
+        self.batches = 0
+        self.keys = 0
+        # Each group is batched separately and resolved by the resolver of its first load
+        self._pending: dict[Hashable, tuple[Resolver, dict[Hashable, list[asyncio.Future]]]] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def load(self, group: Hashable, key: Hashable, resolve: Resolver) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.loads += 1
+
+        if group not in self._pending:
+            self._pending[group] = (resolve, {})
+            # Loads from every request in the window share the batch, not just those from one caller
+            self._timers[group] = loop.call_later(self.window, self._dispatch, group)
+
+        waiters = self._pending[group][1]
+        waiters.setdefault(key, []).append(future)
+        if len(waiters) >= self.max_batch:
+            self._dispatch(group)
+
+        return await future
+
+    async def load_many(self, group: Hashable, keys: list[Hashable], resolve: Resolver) -> list[Any]:
+        return await asyncio.gather(*(self.load(group, key, resolve) for key in keys))
+
+    def _dispatch(self, group: Hashable) -> None:
+        self._timers.pop(group).cancel()
+        resolve, waiters = self._pending.pop(group)
+        self.batches += 1
+        self.keys += len(waiters)
+
+        task = asyncio.ensure_future(self._resolve(resolve, waiters))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    @staticmethod
+    async def _resolve(resolve: Resolver, waiters: dict[Hashable, list[asyncio.Future]]) -> None:
+        try:
+            results = await resolve(list(waiters))
+        except BaseException as error:
+            for futures in waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+            if not isinstance(error, Exception):
+                raise
+            return
+
+        for key, futures in waiters.items():
+            for future in futures:
+                # A caller that was cancelled meanwhile has already given up on its result
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(waiters) for _, waiters in self._pending.values()),
+            "loads": self.loads,
+            "batches": self.batches,
+            "keys": self.keys,
+            "keys_per_batch": self.keys / self.batches if self.batches else 0.0,
+        }
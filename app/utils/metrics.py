@@ -0,0 +1,109 @@
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = tuple[str, ...]
+
+
+def _format_labels(names: Labels, values: Iterable) -> str:
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Labels, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._bounds_ns = [int(bucket * 1e9) for bucket in buckets]
+        # label values -> [count per bucket..., +Inf count, sum in ns]
+        self._series: dict[tuple, list[int]] = {}
+
+    def observe_ns(self, labels: tuple, value_ns: int) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self._bounds_ns) + 2)
+
+        series[bisect_left(self._bounds_ns, value_ns)] += 1
+        series[-1] += value_ns
+
+    def observe(self, labels: tuple, value: float) -> None:
+        self.observe_ns(labels, int(value * 1e9))
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+
+        for label_values, series in self._series.items():
+            cumulative = 0
+            for bucket, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                labels = _format_labels((*self.labels, "le"), (*label_values, bucket))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {series[-1] / 1e9}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: tuple = (), value: float = 0) -> None:
+        self._values[labels] = value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self._metrics: list = []
+        self._stats: dict[str, Callable[[], dict]] = {}
+
+    def histogram(self, name: str, help: str, labels: Labels = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(f"{self.namespace}_{name}", help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, labels: Labels = ()) -> Gauge:
+        metric = Gauge(f"{self.namespace}_{name}", help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, name: str, stats: Callable[[], dict]) -> None:
+        self._stats[name] = stats
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        for name, stats in self._stats.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {self.namespace}_{name}_{key} untyped")
+                    lines.append(f"{self.namespace}_{name}_{key} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(namespace="backend")
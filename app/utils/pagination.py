@@ -0,0 +1,82 @@
+import json
+import base64
+import binascii
+from typing import Any, Literal, Optional
+from fastapi import Response
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+from ..exceptions import BadRequest
+from .filters import coerce_value
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_MODE_HEADER = "X-Total-Count-Mode"
+
+CountMode = Literal["exact", "estimate"]
+
+
+def encode_cursor(values: list[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise BadRequest("Invalid cursor")
+
+    if not isinstance(values, list):
+        raise BadRequest("Invalid cursor")
+
+    return values
+
+def _item_value(item: Any, field: str) -> Any:
+    return item[field] if isinstance(item, dict) else getattr(item, field)
+
+def cursor_fields(sort_key: str) -> tuple[str, ...]:
+    # The primary key breaks ties so that non-unique sort keys still page deterministically
+    return (sort_key,) if sort_key == "id" else (sort_key, "id")
+
+def apply_keyset(query: QuerySet, sort_key: str, after: Optional[str]) -> QuerySet:
+    fields = cursor_fields(sort_key)
+    query = query.order_by(*fields)
+
+    if not after:
+        return query
+
+    values = decode_cursor(after)
+    if len(values) != len(fields):
+        raise BadRequest("Invalid cursor")
+
+    # Cursors come back from clients, so each value is checked against its column before it reaches the query
+    fields_map = query.model._meta.fields_map
+    try:
+        values = [coerce_value(fields_map[field], value) for field, value in zip(fields, values)]
+    except ValueError:
+        raise BadRequest("Invalid cursor")
+
+    if len(fields) == 1:
+        return query.filter(**{f"{sort_key}__gt": values[0]})
+
+    key_value, last_id = values
+    # The OR alone can't bound an index scan, so the ANDed >= gives the planner a start key on (sort_key, id)
+    return query.filter(
+        Q(**{f"{sort_key}__gte": key_value})
+        & (Q(**{f"{sort_key}__gt": key_value}) | Q(**{sort_key: key_value, "id__gt": last_id}))
+    )
+
+def next_cursor(items: list[Any], sort_key: str, limit: Optional[int]) -> Optional[str]:
+    if not items or not limit or len(items) < limit:
+        return None
+
+    last = items[-1]
+    return encode_cursor([_item_value(last, field) for field in cursor_fields(sort_key)])
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+def set_total_count(response: Response, total: int, mode: CountMode) -> None:
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    response.headers[TOTAL_COUNT_MODE_HEADER] = mode
@@ -0,0 +1,74 @@
+import math
+import time
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_SECRET = "calibration-password"
+# Probe at a cost cheap enough to time quickly but high enough that fixed overhead doesn't dominate
+BCRYPT_PROBE_ROUNDS = 8
+# passlib's defaults, which hashes used before calibration: a slow host never calibrates below them, only faster ones go up
+BCRYPT_MIN_ROUNDS = 12
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MIN_ROUNDS = 3
+ARGON2_MAX_ROUNDS = 16
+
+
+def time_hash(handler, samples: int = 3) -> float:
+    # Best of a few runs, so a scheduler hiccup doesn't talk the calibration into a weaker cost
+    best = math.inf
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash(CALIBRATION_SECRET)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def calibrate_bcrypt(target: float, options: dict) -> int:
+    from passlib.hash import bcrypt
+
+    elapsed = time_hash(bcrypt.using(rounds=BCRYPT_PROBE_ROUNDS))
+    # Each bcrypt round doubles the work
+    rounds = BCRYPT_PROBE_ROUNDS + math.floor(math.log2(target / elapsed))
+    return max(BCRYPT_MIN_ROUNDS, min(rounds, BCRYPT_MAX_ROUNDS))
+
+def calibrate_argon2(target: float, options: dict) -> int:
+    from passlib.hash import argon2
+
+    elapsed = time_hash(argon2.using(rounds=1, **options))
+    # Argon2 time cost is a number of passes over the memory, so the work grows linearly
+    rounds = math.floor(target / elapsed)
+    return max(ARGON2_MIN_ROUNDS, min(rounds, ARGON2_MAX_ROUNDS))
+
+CALIBRATORS: dict[str, Callable[[float, dict], int]] = {
+    "bcrypt": calibrate_bcrypt,
+    "argon2": calibrate_argon2,
+}
+
+def scheme_options(scheme: str, argon2_memory_cost: int) -> dict:
+    if scheme == "argon2":
+        return {"memory_cost": argon2_memory_cost}
+    return {}
+
+def build_context(schemes: list[str], target_ms: float, rounds: Optional[int] = None, argon2_memory_cost: int = 65536):
+    # New hashes use the first scheme; the others are only verified, and deprecated so logins can migrate them
+    from passlib.context import CryptContext
+
+    if not schemes:
+        raise ValueError("At least one password scheme is required")
+
+    default = schemes[0]
+    if default not in CALIBRATORS:
+        raise ValueError(f"Unsupported password scheme: {default}")
+
+    options = scheme_options(default, argon2_memory_cost)
+    if not rounds:
+        rounds = CALIBRATORS[default](target_ms / 1000, options)
+        logger.info("Calibrated %s to %d rounds for a %.0f ms hash target", default, rounds, target_ms)
+
+    config = {f"{default}__{key}": value for key, value in options.items()}
+    # min_rounds makes hashes weaker than the calibrated cost need an update; stronger ones are left alone
+    config[f"{default}__rounds"] = rounds
+    config[f"{default}__min_rounds"] = rounds
+
+    return CryptContext(schemes=schemes, default=default, deprecated="auto", **config)
@@ -0,0 +1,58 @@
+import functools
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import Iterable, Optional
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+QUERY_METHODS = ("execute_query", "execute_query_dict", "execute_insert", "execute_many", "execute_script")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration_ns: int = 0
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+
+# Set per request by the middleware; queries outside a request aren't counted
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# A client method calling another one (or its super()) is still a single query
+_in_query: ContextVar[bool] = ContextVar("in_query", default=False)
+
+
+def _instrument(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        stats = query_stats.get()
+        if stats is None or _in_query.get():
+            return await method(*args, **kwargs)
+
+        token = _in_query.set(True)
+        start = perf_counter_ns()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            stats.count += 1
+            stats.duration_ns += perf_counter_ns() - start
+            _in_query.reset(token)
+
+    wrapper.instrumented = True
+    return wrapper
+
+def _subclasses(cls: type) -> Iterable[type]:
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _subclasses(subclass)
+
+def instrument_clients() -> None:
+    # Tortoise has no query hook, so the execute methods are wrapped on every client class loaded so far.
+    # That includes the transaction wrappers, which override some of them, and any base a client inherits them from.
+    for cls in _subclasses(BaseDBAsyncClient):
+        for name in QUERY_METHODS:
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, "instrumented", False):
+                setattr(cls, name, _instrument(method))
@@ -0,0 +1,90 @@
+import time
+import asyncio
+import itertools
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Literal, Optional
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.exceptions import DBConnectionError
+
+# asyncpg is only needed for PostgreSQL replicas
+try:
+    from asyncpg import CannotConnectNowError, InterfaceError, PostgresConnectionError
+except ImportError:
+    CannotConnectNowError = InterfaceError = PostgresConnectionError = ()
+
+ReplicaSelection = Literal["round_robin", "least_busy"]
+
+# Connection-level errors, which mark a replica unhealthy and retry the read on the primary.
+# Query errors (bad SQL, invalid data) would fail on the primary too, so they are raised as they are.
+REPLICA_ERRORS = (
+    DBConnectionError, OSError, asyncio.TimeoutError,
+    PostgresConnectionError, CannotConnectNowError, InterfaceError,
+)
+
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+def pin_primary() -> None:
+    # Set by writes so the rest of the request reads its own writes instead of a lagging replica
+    read_from_primary.set(True)
+
+
+class ReplicaRouter:
+    def __init__(self, names: list[str], selection: ReplicaSelection = "round_robin", retry_after: float = 5.0) -> None:
+        self.names = list(names)
+        self.selection = selection
+        self.retry_after = retry_after
+        self.primary_reads = 0
+        self.failures = 0
+        self._turn = itertools.count()
+        self._in_flight = dict.fromkeys(self.names, 0)
+        self._reads = dict.fromkeys(self.names, 0)
+        self._down_until = dict.fromkeys(self.names, 0.0)
+
+    def healthy(self) -> list[str]:
+        now = time.monotonic()
+        return [name for name in self.names if self._down_until[name] <= now]
+
+    def pick(self) -> Optional[str]:
+        if not self.names or read_from_primary.get():
+            return None
+
+        healthy = self.healthy()
+        if not healthy:
+            return None
+
+        if self.selection == "least_busy":
+            return min(healthy, key=self._in_flight.__getitem__)
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_failed(self, name: str) -> None:
+        self.failures += 1
+        self._down_until[name] = time.monotonic() + self.retry_after
+
+    async def run(self, read: Callable[[Optional[BaseDBAsyncClient]], Awaitable[Any]]) -> Any:
+        # `read` gets the replica connection, or None for the model's default (primary) connection
+        name = self.pick()
+
+        if name is not None:
+            self._in_flight[name] += 1
+            try:
+                result = await read(connections.get(name))
+            except REPLICA_ERRORS:
+                self.mark_failed(name)
+            else:
+                self._reads[name] += 1
+                return result
+            finally:
+                self._in_flight[name] -= 1
+
+        self.primary_reads += 1
+        return await read(None)
+
+    def stats(self) -> dict:
+        healthy = set(self.healthy())
+        stats = {"replicas": len(self.names), "healthy": len(healthy), "primary_reads": self.primary_reads, "failures": self.failures}
+        for name in self.names:
+            stats[f"{name}_reads"] = self._reads[name]
+            stats[f"{name}_in_flight"] = self._in_flight[name]
+        return stats
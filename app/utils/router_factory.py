@@ -1,14 +1,27 @@
+import inspect
+from functools import partial
 from dataclasses import dataclass
 from typing import Type, Optional
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from .base_repo import BaseRepository
-from .schema_factory import PydanticModels, create_schemas
+from .pagination import CountMode, set_next_cursor, set_total_count
+from .export import ExportFormat, export_response
+from .serialization import dump_rows, dump_models, fast_response, msgpack_headers, msgpack_response
+from .schema_factory import PydanticModels, BulkResultModel, create_schemas, schema_fields
+from .filters import filter_from_query, ids_from_query
+from .etag import make_etag, not_modified, set_etag
+from .admission import AdmissionLimiter, admission
 
 class DefaultCRUDParameters:
     @staticmethod
-    async def get_all(skip: int = 0, limit: int = 100, filter_dict: Optional[dict] = None):
-        return {"skip": skip, "limit": limit, "filter": filter_dict}
+    async def get_all(skip: int = 0, limit: int = 100, filter: Optional[str] = None, filter_value: Optional[str] = None, filter_op: str = "eq", sort: Optional[str] = None, after: Optional[str] = None, count: Optional[CountMode] = None, ids: Optional[str] = None):
+        return {"skip": skip, "limit": limit, "filter": filter_from_query(filter, filter_value, filter_op), "sort": sort, "after": after, "count": count, "ids": ids_from_query(ids)}
+
+    @staticmethod
+    async def export(format: ExportFormat = "ndjson", filter: Optional[str] = None, filter_value: Optional[str] = None, filter_op: str = "eq"):
+        return {"format": format, "filter": filter_from_query(filter, filter_value, filter_op)}
 
     @staticmethod
     async def get(id: int):
@@ -22,6 +35,14 @@ class DefaultCRUDParameters:
     async def put(id: int, input: Type[BaseModel]):
         return {"id": id, **input.model_dump()}
 
+    @staticmethod
+    async def post_many(input: Type[BaseModel]):
+        return {"items": [item.model_dump() for item in input.items]}
+
+    @staticmethod
+    async def put_many(input: Type[BaseModel]):
+        return {"items": [item.model_dump() for item in input.items]}
+
     @staticmethod
     async def delete(id: int):
         return {"id": id}
@@ -30,45 +51,124 @@ class DefaultCRUDParameters:
 @dataclass(frozen=True)
 class CRUDParameters:
     GET_ALL: Optional[callable] = staticmethod(DefaultCRUDParameters.get_all)
+    EXPORT: Optional[callable] = staticmethod(DefaultCRUDParameters.export)
     GET: Optional[callable] = staticmethod(DefaultCRUDParameters.get)
     POST: Optional[callable] = staticmethod(DefaultCRUDParameters.post)
     PUT: Optional[callable] = staticmethod(DefaultCRUDParameters.put)
+    POST_MANY: Optional[callable] = staticmethod(DefaultCRUDParameters.post_many)
+    PUT_MANY: Optional[callable] = staticmethod(DefaultCRUDParameters.put_many)
     DELETE: Optional[callable] = staticmethod(DefaultCRUDParameters.delete)
 
 
+def bind_input_schema(parser: callable, schema: Type[BaseModel]) -> callable:
+    # FastAPI reads the request body from the parser's signature, so its generic 'input' has to carry the real schema
+    async def dependency(**kwargs):
+        return await parser(**kwargs)
+
+    signature = inspect.signature(parser)
+    dependency.__signature__ = signature.replace(parameters=[
+        param.replace(annotation=schema) if param.name == "input" else param
+        for param in signature.parameters.values()
+    ])
+    return dependency
+
+
 def create_rest_router(
         repo: Type[BaseRepository],
         schemas: PydanticModels = None,
-        params_parser: CRUDParameters = CRUDParameters
+        params_parser: CRUDParameters = CRUDParameters,
+        fast_responses: bool = False,
+        limits: Optional[dict[str, AdmissionLimiter]] = None
         ) -> APIRouter:
     
     router = APIRouter()
+    # Admission limits are keyed like the CRUDParameters fields, e.g. {"POST": limiter}
+    limits = limits or {}
 
     model = repo.model
-    model_name = model.__name__.lower()
 
     if not schemas:
-        schemas = create_schemas(model, schemas)
-
-    @router.get("/")
-    async def read_all(repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.GET_ALL)) -> list[schemas.read]:
-        return await repo_instance.get_all(**params)
+        schemas = create_schemas(model, schemas, extended=True)
+
+    read_fields = schema_fields(schemas.read, model)
+    version_field = repo.version_field
+    # The version rides along with every read so the ETag comes from the same rows that are sent.
+    # A read schema may already include it, and a field listed twice makes .values() fail.
+    fetch_fields = list(dict.fromkeys([*read_fields, version_field])) if version_field else read_fields
+
+    if schemas.create_many:
+        @router.post("/bulk", dependencies=admission(limits.get("POST_MANY")))
+        async def create_many(input: schemas.create_many, repo_instance: BaseRepository = Depends(repo), params = Depends(bind_input_schema(params_parser.POST_MANY, schemas.create_many))) -> list[BulkResultModel[schemas.read]]:
+            results = await repo_instance.create_many(**params)
+            return [BulkResultModel[schemas.read](status=result.status, item=result.item) for result in results]
+
+    if schemas.update_many:
+        @router.put("/bulk", dependencies=admission(limits.get("PUT_MANY")))
+        async def update_many(input: schemas.update_many, repo_instance: BaseRepository = Depends(repo), params = Depends(bind_input_schema(params_parser.PUT_MANY, schemas.update_many))) -> list[BulkResultModel[schemas.read]]:
+            results = await repo_instance.update_many(**params)
+            return [BulkResultModel[schemas.read](status=result.status, item=result.item) for result in results]
+
+    @router.get("/", dependencies=admission(limits.get("GET_ALL")))
+    async def read_all(request: Request, response: Response, repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.GET_ALL)) -> list[schemas.read]:
+        count = params.pop("count", None)
+        ids = params.pop("ids", None)
+
+        if ids is not None:
+            items = await repo_instance.get_many(ids, fields=fetch_fields)
+            if version_field:
+                set_etag(response, make_etag([repo_instance.row_version(item) for item in items]))
+            packed = msgpack_response(request, items, read_fields, response)
+            if packed:
+                return packed
+            return fast_response(dump_rows(items, read_fields), response) if fast_responses else items
+
+        # A total isn't covered by the page's ETag, so counted lists are always sent in full
+        if version_field and not count:
+            unchanged, _ = await not_modified(request, partial(repo_instance.list_versions, **params))
+            if unchanged:
+                msgpack_headers(request, unchanged)
+                return unchanged
+
+        items = await repo_instance.get_all(**params, fields=fetch_fields)
+        set_next_cursor(response, repo_instance.next_cursor(items, params.get("limit"), params.get("sort")))
+        if count:
+            set_total_count(response, await repo_instance.count(params.get("filter"), count), count)
+        if version_field:
+            set_etag(response, make_etag([repo_instance.row_version(item) for item in items]))
+        packed = msgpack_response(request, items, read_fields, response)
+        if packed:
+            return packed
+        return fast_response(dump_rows(items, read_fields), response) if fast_responses else items
+
+    @router.get("/export", response_class=StreamingResponse, dependencies=admission(limits.get("EXPORT")))
+    async def export(repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.EXPORT)) -> StreamingResponse:
+        chunks = repo_instance.stream(fields=read_fields, filter=params["filter"])
+        return export_response(chunks, read_fields, params["format"], model.__name__.lower())
         
-    @router.get("/{%s_id}" % model_name)
-    async def read(repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.GET)) -> schemas.read:
-        return await repo_instance.get(**params)
-
-    @router.post("/")
-    async def create(input: schemas.create, repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.POST)) -> schemas.read:
+    @router.get("/{id}", dependencies=admission(limits.get("GET")))
+    async def read(request: Request, response: Response, repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.GET)) -> schemas.read:
+        version = None
+        if version_field:
+            unchanged, version = await not_modified(request, partial(repo_instance.version, **params))
+            if unchanged:
+                return unchanged
+
+        item = await repo_instance.get(**params, fields=fetch_fields, version=version)
+        if version_field:
+            set_etag(response, make_etag(repo_instance.row_version(item)))
+        return fast_response(dump_rows(item, read_fields), response) if fast_responses else item
+
+    @router.post("/", dependencies=admission(limits.get("POST")))
+    async def create(input: schemas.create, repo_instance: BaseRepository = Depends(repo), params = Depends(bind_input_schema(params_parser.POST, schemas.create))) -> schemas.read:
         new_item = await repo_instance.create(**params)
-        return schemas.read.model_validate(new_item)
+        return fast_response(dump_models(schemas.read, new_item)) if fast_responses else schemas.read.model_validate(new_item)
 
-    @router.put("/{%s_id}" % model_name)
-    async def update(input: schemas.update, repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.PUT)) -> schemas.read:
+    @router.put("/{id}", dependencies=admission(limits.get("PUT")))
+    async def update(input: schemas.update, repo_instance: BaseRepository = Depends(repo), params = Depends(bind_input_schema(params_parser.PUT, schemas.update))) -> schemas.read:
         updated_item = await repo_instance.update(**params)
-        return schemas.read.model_validate(updated_item)
+        return fast_response(dump_models(schemas.read, updated_item)) if fast_responses else schemas.read.model_validate(updated_item)
 
-    @router.delete("/{%s_id}" % model_name)
+    @router.delete("/{id}", dependencies=admission(limits.get("DELETE")))
     async def delete(repo_instance: BaseRepository = Depends(repo), params = Depends(params_parser.DELETE)) -> None:
         await repo_instance.delete(**params)
 
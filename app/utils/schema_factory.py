@@ -1,6 +1,6 @@
 from dataclasses import dataclass
-from pydantic import BaseModel
-from typing import Type, TypeVar, Optional
+from pydantic import BaseModel, create_model
+from typing import Any, Callable, Type, TypeVar, Optional, Generic
 from tortoise.models import Model
 from tortoise.contrib.pydantic import pydantic_model_creator
 from tortoise.fields import (
@@ -14,12 +14,16 @@ CreateModel = TypeVar("CreateModel", bound=BaseModel)
 UpdateModel = TypeVar("UpdateModel", bound=BaseModel)
 InDatabaseModel = TypeVar("InDatabaseModel", bound=BaseModel)
 
-class CreateManyModel(BaseModel):
+class CreateManyModel(BaseModel, Generic[CreateModel]):
     items: list[CreateModel]
 
-class UpdateManyModel(BaseModel):
+class UpdateManyModel(BaseModel, Generic[UpdateModel]):
     items: list[UpdateModel]
 
+class BulkResultModel(BaseModel, Generic[InDatabaseModel]):
+    status: str
+    item: Optional[InDatabaseModel] = None
+
 @dataclass(frozen=True, slots=True)
 class PydanticModels:
     create: Type[CreateModel]
@@ -31,6 +35,17 @@ class PydanticModels:
 class SchemaFactory():
     Config = dict(extra = 'ignore', from_attributes = True)
 
+    def __init__(self) -> None:
+        self._registry: dict[tuple, Type[BaseModel]] = {}
+
+    def _memoized(self, kind: str, model: Type[Model], exclude_fields: tuple[str], build: Callable[[], Any]) -> Any:
+        # pydantic_model_creator is expensive, so each (model, kind, excludes) schema is built once per process
+        key = (model, kind, frozenset(exclude_fields))
+        schema = self._registry.get(key)
+        if schema is None:
+            schema = self._registry[key] = build()
+        return schema
+
     @staticmethod
     def __get_relational_fields(model: Model):
         relational_fields = (
@@ -47,12 +62,17 @@ class SchemaFactory():
         return model._meta.fk_fields
 
     def create_create_schema(self, model: Type[Model], exclude_fields: tuple[str] = ()) -> CreateModel:
-         return pydantic_model_creator(model, name=f"{model.__name__}Create", exclude_readonly=True, exclude=exclude_fields, model_config=self.Config)
+        return self._memoized("create", model, exclude_fields, lambda: pydantic_model_creator(
+            model, name=f"{model.__name__}Create", exclude_readonly=True, exclude=exclude_fields, model_config=self.Config))
 
     def create_update_schema(self, model: Type[Model], exclude_fields: tuple[str] = ()) -> UpdateModel:
-        return pydantic_model_creator(model, name=f"{model.__name__}Update", exclude_readonly=True, exclude=exclude_fields, model_config=self.Config)
+        return self._memoized("update", model, exclude_fields, lambda: pydantic_model_creator(
+            model, name=f"{model.__name__}Update", exclude_readonly=True, exclude=exclude_fields, model_config=self.Config))
 
     def create_in_db_schema(self, model: Type[Model], exclude_fields: tuple[str] = ()) -> InDatabaseModel:
+        return self._memoized("in_db", model, exclude_fields, lambda: self.__build_in_db_schema(model, exclude_fields))
+
+    def __build_in_db_schema(self, model: Type[Model], exclude_fields: tuple[str]) -> InDatabaseModel:
         exclude_fields_set = set(exclude_fields)
         relational_fields_set = set(self.__get_relational_fields(model))
         fk_fields_set = set(self.__get_foreign_key_fields(model))
@@ -62,15 +82,23 @@ class SchemaFactory():
 
     def create_create_many_schema(self, model: Type[Model], exclude_fields: tuple[str] = ()) -> CreateManyModel:
         CreateSchema = self.create_create_schema(model, exclude_fields)
-        return CreateManyModel[CreateSchema]
+        return self._memoized("create_many", model, exclude_fields, lambda: CreateManyModel[CreateSchema])
 
     def create_update_many_schema(self, model: Type[Model], exclude_fields: tuple[str] = ()) -> UpdateManyModel:
+        return self._memoized("update_many", model, exclude_fields, lambda: self.__build_update_many_schema(model, exclude_fields))
+
+    def __build_update_many_schema(self, model: Type[Model], exclude_fields: tuple[str]) -> UpdateManyModel:
         UpdateSchema = self.create_update_schema(model, exclude_fields)
-        return UpdateManyModel[UpdateSchema]
+        pk_type = model._meta.pk.field_type
+        UpdateWithIdSchema = create_model(f"{model.__name__}UpdateWithId", __base__=UpdateSchema, id=(pk_type, ...))
+        return UpdateManyModel[UpdateWithIdSchema]
 
 
 schema_factory = SchemaFactory()
 
+def schema_fields(schema: Type[BaseModel], model: Type[Model]) -> list[str]:
+    return [field for field in schema.model_fields if field in model._meta.fields_db_projection]
+
 def create_schemas(model, schemas: PydanticModels = None, extended = False):
     CreateSchema = schema_factory.create_create_schema(model) if not schemas else schemas.create
     UpdateSchema = schema_factory.create_update_schema(model) if not schemas else schemas.update
@@ -0,0 +1,77 @@
+from functools import lru_cache
+from typing import Any, Optional, Type
+import orjson
+import ormsgpack
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+from .encoding import parse_accept, timed
+from .etag import weaken_etag
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+JSON_MEDIA_RANGES = ("application/json", "application/*", "*/*")
+
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+
+@lru_cache(maxsize=None)
+def response_adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+def project_rows(rows: list[dict[str, Any]] | dict[str, Any], fields: list[str]) -> list[dict[str, Any]] | dict[str, Any]:
+    # Rows projected from our own tables are already shaped like the schema, so they skip validation entirely
+    sample = rows if isinstance(rows, dict) else (rows[0] if rows else None)
+    if sample is not None and len(sample) != len(fields):
+        return {field: rows[field] for field in fields} if isinstance(rows, dict) else [{field: row[field] for field in fields} for row in rows]
+    return rows
+
+def dump_rows(rows: list[dict[str, Any]] | dict[str, Any], fields: list[str]) -> bytes:
+    rows = project_rows(rows, fields)
+    return timed("json", lambda: orjson.dumps(rows))
+
+def pack_rows(rows: list[dict[str, Any]] | dict[str, Any], fields: list[str]) -> bytes:
+    rows = project_rows(rows, fields)
+    return timed("msgpack", lambda: ormsgpack.packb(rows))
+
+def accepts_msgpack(request: Request) -> bool:
+    header = request.headers.get("accept")
+    if not header or "msgpack" not in header:
+        return False
+
+    accepted = parse_accept(header)
+    msgpack_quality = max(accepted.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    json_quality = max(accepted.get(media_range, 0.0) for media_range in JSON_MEDIA_RANGES)
+    # JSON stays the default, MessagePack is only sent when asked for at least as strongly
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+def dump_models(schema: Type[BaseModel], items: Any) -> bytes:
+    adapter = response_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+def fast_response(body: bytes, response: Optional[Response] = None, status_code: int = 200, response_class: Type[Response] = JSONBytesResponse) -> Response:
+    fast = response_class(body, status_code=status_code)
+    if response is not None:
+        # Headers set on the injected response are otherwise dropped when a handler returns its own Response
+        fast.headers.raw.extend(response.headers.raw)
+    return fast
+
+def msgpack_headers(request: Request, response: Response) -> bool:
+    # Routes that offer MessagePack vary on Accept, whichever format this request gets; their 304s need the same headers
+    response.headers.append("Vary", "Accept")
+    if not accepts_msgpack(request):
+        return False
+
+    # Same rows, different bytes: the validator is only weakly equal to the JSON one, and If-None-Match compares weakly anyway
+    weaken_etag(response.headers)
+    return True
+
+def msgpack_response(request: Request, rows: list[dict[str, Any]], fields: list[str], response: Response) -> Optional[MsgPackResponse]:
+    if not msgpack_headers(request, response):
+        return None
+    return fast_response(pack_rows(rows, fields), response, response_class=MsgPackResponse)
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], copy: Optional[Callable[[Any], Any]] = None) -> Any:
+        task = self._flights.get(key)
+
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # Shielded so a cancelled leader doesn't cancel the query under its followers
+        result = await asyncio.shield(task)
+        # Every caller, the leader included, gets its own copy: the leader resumes first and could mutate the shared result
+        return copy(result) if copy else result
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+        if not task.cancelled():
+            task.exception()
+
+    def forget(self) -> None:
+        # Reads started from now on go to the database instead of joining flights that may predate a write
+        self._flights.clear()
+
+    def stats(self) -> dict:
+        total = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalescing_ratio": self.coalesced / total if total else 0.0,
+        }
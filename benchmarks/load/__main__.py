@@ -0,0 +1,60 @@
+import sys
+import asyncio
+import logging
+import argparse
+from .runner import run
+from .baseline import save_baseline, load_baseline, find_regressions
+
+ROUTES = ("login", "read_user", "read_users")
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("tortoise").setLevel(logging.WARNING)
+
+
+def print_results(results: dict[str, dict]) -> None:
+    print(f"{'route':<12} {'requests':>8} {'errors':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, result in results.items():
+        print(f"{route:<12} {result['requests']:>8} {result['errors']:>6} {result['throughput_rps']:>10.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load and latency benchmark of the API routes")
+    parser.add_argument("--database", choices=("sqlite", "postgres"), default="sqlite", help="sqlite runs in memory, postgres uses the DB_* settings")
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--login-requests", type=int, default=50, help="requests for the bcrypt-bound login route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20, help="discarded requests per route")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="fail when results regress past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(
+        database=args.database,
+        server=args.server,
+        port=args.port,
+        users=args.users,
+        requests=args.requests,
+        login_requests=args.login_requests,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        routes=args.routes,
+    ))
+    print_results(results)
+
+    if args.save_baseline:
+        meta = {key: getattr(args, key) for key in ("database", "server", "users", "requests", "login_requests", "concurrency")}
+        save_baseline(args.save_baseline, results, meta)
+
+    if args.baseline:
+        regressions = find_regressions(load_baseline(args.baseline), results, args.threshold)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
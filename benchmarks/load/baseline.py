@@ -0,0 +1,34 @@
+import json
+from pathlib import Path
+
+# Lower is better for latencies, higher is better for throughput
+LATENCY_KEYS = ("p50_ms", "p95_ms")
+THROUGHPUT_KEYS = ("throughput_rps",)
+
+
+def save_baseline(path: str, results: dict[str, dict], meta: dict) -> None:
+    Path(path).write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+
+def load_baseline(path: str) -> dict[str, dict]:
+    return json.loads(Path(path).read_text())["results"]
+
+def find_regressions(baseline: dict[str, dict], results: dict[str, dict], threshold: float) -> list[str]:
+    regressions = []
+
+    for route, current in results.items():
+        if current["errors"]:
+            regressions.append(f"{route}: {current['errors']} failed requests")
+
+        previous = baseline.get(route)
+        if previous is None:
+            continue
+
+        for key in LATENCY_KEYS:
+            if current[key] > previous[key] * (1 + threshold):
+                regressions.append(f"{route}: {key} {previous[key]} -> {current[key]}")
+
+        for key in THROUGHPUT_KEYS:
+            if current[key] < previous[key] * (1 - threshold):
+                regressions.append(f"{route}: {key} {previous[key]} -> {current[key]}")
+
+    return regressions
@@ -0,0 +1,156 @@
+import math
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from tortoise import Tortoise
+from app import create_app
+from app.database import TORTOISE_ORM
+from app.database.user_repository import user_repository
+from app.security import hash_password
+from app.settings import settings
+
+BENCH_PASSWORD = "bench-password"
+SQLITE_URL = "sqlite://:memory:"
+# Queued bcrypt work under high concurrency easily outlasts httpx's 5 second default
+REQUEST_TIMEOUT = 60.0
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    path: str
+    requests: int
+    params: Callable[[], dict] = dict
+    authenticated: bool = False
+
+
+def build_app(database: str) -> FastAPI:
+    # register_tortoise reads TORTOISE_ORM when the app is created, so the connection has to be swapped first
+    if database == "sqlite":
+        TORTOISE_ORM["connections"]["default"] = SQLITE_URL
+    return create_app()
+
+@asynccontextmanager
+async def serve(app: FastAPI, server: str, port: int) -> AsyncIterator[httpx.AsyncClient]:
+    if server == "inprocess":
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=REQUEST_TIMEOUT) as client:
+                yield client
+        return
+
+    instance = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    task = asyncio.create_task(instance.serve())
+
+    while not instance.started:
+        if task.done():
+            task.result()
+            raise RuntimeError("uvicorn exited before startup completed")
+        await asyncio.sleep(0.05)
+
+    try:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=REQUEST_TIMEOUT) as client:
+            yield client
+    finally:
+        instance.should_exit = True
+        await task
+
+async def seed_users(count: int) -> list[str]:
+    # One hash shared by every user keeps seeding fast; rows that already exist are left alone
+    await Tortoise.generate_schemas(safe=True)
+    password = hash_password(BENCH_PASSWORD)
+    usernames = [f"bench{i}" for i in range(count)]
+
+    await user_repository.create_many([
+        {"name": f"Bench User {i}", "age": 20 + i % 60, "username": username, "password": password}
+        for i, username in enumerate(usernames)
+    ])
+    return usernames
+
+async def login(client: httpx.AsyncClient, username: str) -> str:
+    response = await client.post("/api/login", params={"username": username, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["token"]
+
+def scenarios(usernames: list[str], requests: int, login_requests: int) -> list[Scenario]:
+    # Login is bound by the bcrypt cost, so it gets its own, smaller request count
+    return [
+        Scenario("login", "POST", "/api/login", login_requests, lambda: {"username": random.choice(usernames), "password": BENCH_PASSWORD}),
+        Scenario("read_user", "GET", "/api/user", requests, authenticated=True),
+        Scenario("read_users", "GET", "/api/users", requests, lambda: {"limit": 100}),
+    ]
+
+def percentile(sorted_values: list[int], percent: float) -> int:
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(latencies_ns: list[int], errors: int, elapsed: float, concurrency: int) -> dict:
+    latencies_ns = sorted(latencies_ns)
+    return {
+        "requests": len(latencies_ns),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies_ns) / elapsed, 2),
+        "mean_ms": round(sum(latencies_ns) / len(latencies_ns) / 1e6, 3),
+        "p50_ms": round(percentile(latencies_ns, 50) / 1e6, 3),
+        "p95_ms": round(percentile(latencies_ns, 95) / 1e6, 3),
+        "p99_ms": round(percentile(latencies_ns, 99) / 1e6, 3),
+    }
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int, headers: Optional[dict] = None) -> dict:
+    latencies_ns: list[int] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        # Workers share one iterator, so exactly `requests` requests are sent however they interleave
+        for _ in pending:
+            start = time.perf_counter_ns()
+            response = await client.request(scenario.method, scenario.path, params=scenario.params(), headers=headers)
+            latencies_ns.append(time.perf_counter_ns() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies_ns, errors, time.perf_counter() - started, concurrency)
+
+async def run(
+        *,
+        database: str,
+        server: str,
+        port: int,
+        users: int,
+        requests: int,
+        login_requests: int,
+        concurrency: int,
+        warmup: int,
+        routes: Optional[list[str]] = None
+    ) -> dict[str, dict]:
+
+    app = build_app(database)
+    results = {}
+
+    async with serve(app, server, port) as client:
+        usernames = await seed_users(users)
+        token = await login(client, usernames[0])
+        auth_headers = {"Cookie": f"{settings.JWT_KEY_NAME}={token}"}
+
+        for scenario in scenarios(usernames, requests, login_requests):
+            if routes and scenario.name not in routes:
+                continue
+
+            headers = auth_headers if scenario.authenticated else None
+            if warmup:
+                await drive(client, scenario, warmup, concurrency, headers)
+            results[scenario.name] = await drive(client, scenario, scenario.requests, concurrency, headers)
+
+    return results
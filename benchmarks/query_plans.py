@@ -0,0 +1,100 @@
+import re
+import sys
+import json
+import asyncio
+import argparse
+from functools import partial
+from tortoise import Tortoise, fields
+from tortoise.transactions import in_transaction
+from app.database import TORTOISE_ORM
+from app.database.user_repository import UserRepository
+from app.utils.base_repo import BaseRepository
+from app.utils.pagination import cursor_fields, encode_cursor
+
+REPOSITORIES = [UserRepository]
+
+SAMPLES = {"eq": "{0}", "prefix": "{0}", "range": "{0},{0}", "in": "{0},{0}"}
+
+
+def sample_value(repository: BaseRepository, name: str, operator: str) -> str:
+    field = repository.model._meta.fields_map[name]
+    value = "1" if isinstance(field, fields.IntField) else "a"
+    return SAMPLES[operator].format(value)
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+def index_condition_on(plan: dict, column: str) -> bool:
+    # An Index Cond (or a bitmap Recheck Cond) naming the column means its own index answers the filter
+    pattern = re.compile(rf"\b{re.escape(column)}\b")
+    return any(pattern.search(node.get("Index Cond", "") + node.get("Recheck Cond", "")) for node in plan_nodes(plan))
+
+def sorted_by_index(plan: dict) -> bool:
+    # An Incremental Sort only orders ties within a key an index already returns sorted (e.g. unique username, then id)
+    return not any(node["Node Type"] == "Sort" for node in plan_nodes(plan))
+
+def cursor_bounded(plan: dict, column: str) -> bool:
+    return sorted_by_index(plan) and index_condition_on(plan, column)
+
+def list_queries(repository: BaseRepository):
+    spec = repository.filter_spec
+    model = repository.model
+
+    # Filters are planned without ORDER BY/LIMIT: otherwise the planner can walk the primary key and apply them as a plain Filter
+    for name, operators in spec.fields.items():
+        column = model._meta.fields_db_projection[name]
+        for operator in operators:
+            filter = spec.resolve({f"{name}__{operator}": sample_value(repository, name, operator)}, model)
+            yield f"{name}__{operator}", model.filter(**filter), partial(index_condition_on, column=column)
+
+    # Later pages must start from the cursor in the index, not scan up to it
+    for sort in spec.sort_keys:
+        column = model._meta.fields_db_projection[sort]
+        cursor = encode_cursor([sample_value(repository, field, "eq") for field in cursor_fields(sort)])
+        yield f"sort={sort}", repository.list_query(sort=sort), sorted_by_index
+        yield f"sort={sort}&after", repository.list_query(sort=sort, after=cursor), partial(cursor_bounded, column=column)
+
+async def explain(query, connection) -> dict:
+    rows = await query.using_db(connection).explain()
+    return json.loads(rows[0]["QUERY PLAN"])[0]["Plan"]
+
+async def check(repository: BaseRepository) -> list[str]:
+    failures = []
+
+    async with in_transaction(repository.model._meta.default_connection) as connection:
+        # The check runs on a near-empty schema, where scanning everything is cheapest; disabling seq scans and sorts
+        # makes the planner show whether an index can answer the query at all
+        await connection.execute_script("SET LOCAL enable_seqscan = off; SET LOCAL enable_sort = off")
+
+        for label, query, index_backed in list_queries(repository):
+            uses_index = index_backed(await explain(query, connection))
+            print(f"{repository.model.__name__:<10} {label:<20} {'index' if uses_index else 'NO INDEX'}")
+
+            if not uses_index:
+                failures.append(f"{repository.model.__name__} {label}")
+
+    return failures
+
+async def run() -> list[str]:
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        failures = []
+        for repository in REPOSITORIES:
+            failures.extend(await check(repository()))
+        return failures
+    finally:
+        await Tortoise.close_connections()
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every allowed filter and sort of the list endpoints is index-backed (PostgreSQL)")
+    parser.parse_args()
+
+    failures = asyncio.run(run())
+    if failures:
+        print(f"Not index-backed: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
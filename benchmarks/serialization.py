@@ -0,0 +1,64 @@
+import time
+import logging
+import asyncio
+import argparse
+import httpx
+from fastapi import FastAPI
+from app.schemas import CreateUserOutput
+from app.utils.serialization import dump_rows, fast_response
+
+FIELDS = list(CreateUserOutput.model_fields)
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def make_rows(count: int) -> list[dict]:
+    return [{"id": i, "name": f"user {i}", "age": 20 + i % 50, "username": f"user{i}"} for i in range(count)]
+
+def create_bench_app(rows: list[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/default", response_model=list[CreateUserOutput])
+    async def default() -> list[dict]:
+        return rows
+
+    @app.get("/fast", response_model=list[CreateUserOutput])
+    async def fast() -> list[dict]:
+        return fast_response(dump_rows(rows, FIELDS))
+
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    for _ in range(min(requests, 50)):
+        await client.get(path)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.get(path)
+    return (time.perf_counter() - start) / requests
+
+async def run(rows_per_page: int, requests: int) -> dict[str, float]:
+    app = create_bench_app(make_rows(rows_per_page))
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/default", "/fast"):
+            results[path] = await measure(client, path, requests)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-item response serialization cost of a /users page")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.rows, args.requests))
+    baseline = results["/default"]
+
+    for path, per_request in results.items():
+        print(f"{path:<10} {per_request * 1e6:9.1f} us/request  {per_request / args.rows * 1e6:7.2f} us/item  x{baseline / per_request:.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import sys
+import argparse
+import statistics
+import subprocess
+
+SCENARIOS = {
+    "settings": "import app.settings",
+    "tortoise config (aerich)": "import app.database",
+    "server supervisor": "import app.__main__",
+    "create_app()": "from app import create_app; create_app()",
+}
+
+TIMED = "import time; start = time.perf_counter(); {code}; print(time.perf_counter() - start)"
+
+
+def measure(code: str, runs: int) -> float:
+    # Every run is a fresh interpreter, so nothing is already in sys.modules
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", TIMED.format(code=code)], capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+def slowest_imports(code: str, top: int) -> list[tuple[int, str]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    imports = []
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only modules imported directly by the code under test; their children are included in the cumulative time
+        if len(name) - len(name.lstrip()) == 1:
+            imports.append((int(cumulative), name.strip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup profile of the app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports of create_app()")
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        print(f"{name:<26} {measure(code, args.runs) * 1e3:8.1f} ms")
+
+    print(f"\nSlowest imports of create_app():")
+    for cumulative_us, module in slowest_imports(SCENARIOS["create_app()"], args.top):
+        print(f"  {module:<40} {cumulative_us / 1e3:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_user_name_bf2d3a" ON "user" ("name", "id");
+CREATE INDEX IF NOT EXISTS "idx_user_age_35eede" ON "user" ("age", "id");
+CREATE INDEX IF NOT EXISTS "idx_user_name_pattern" ON "user" ("name" text_pattern_ops);
+CREATE INDEX IF NOT EXISTS "idx_user_username_pattern" ON "user" ("username" varchar_pattern_ops);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_user_name_bf2d3a";
+DROP INDEX IF EXISTS "idx_user_age_35eede";
+DROP INDEX IF EXISTS "idx_user_name_pattern";
+DROP INDEX IF EXISTS "idx_user_username_pattern";"""
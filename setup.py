@@ -3,18 +3,27 @@ from setuptools import setup, find_packages
 setup(
     name="backend",
     version="0.1",
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     package_dir={'app': 'app'},
     install_requires=[
         'aerich',
         'fastapi',
         'uvicorn',
+        'uvloop; sys_platform != "win32"',
+        'httptools',
         'python-multipart',
         'pydantic',
         'pydantic-settings',
         'tortoise-orm[asyncpg]',
         'python-jose[cryptography]',
         'bcrypt==4.0.1',
+        'argon2-cffi',
         'passlib',
+        'orjson',
+        'ormsgpack',
+        'brotli',
     ],
+    extras_require={
+        'bench': ['httpx'],
+    },
 )